@@ -0,0 +1,376 @@
+#!/usr/bin/env python
+
+"""
+loadtest.py -- load test of ConferenceApi against the App Engine testbed
+    stubs; seeds Profiles/Conferences/Sessions, drives concurrent scenarios
+    and reports p50/p95/p99 latency and datastore RPCs per endpoint
+
+Run from the repository root with the App Engine SDK available:
+
+    GAE_SDK=/path/to/google_appengine python benchmarks/loadtest.py \\
+        [--profiles 500] [--conferences 200] [--sessions 10] \\
+        [--threads 8] [--requests 400] [--scenario registration ...]
+
+Endpoints are called in-process, each call in a fresh ndb context as a
+real request would be, with endpoints.get_current_user stubbed per thread.
+Queued tasks (seat reconciles, featured speakers, ...) are run through the
+webapp2 app between scenarios and are not timed.
+
+"""
+
+import argparse
+import base64
+import collections
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date
+from datetime import time as dtime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+if os.environ.get('GAE_SDK'):
+    sys.path.insert(0, os.environ['GAE_SDK'])
+    import dev_appserver
+    dev_appserver.fix_sys_path()
+os.environ.setdefault('APPLICATION_ID', 'dev~loadtest')
+
+import endpoints
+import webapp2
+from protorpc import message_types
+
+from google.appengine.api import apiproxy_stub_map
+from google.appengine.api import users
+from google.appengine.datastore import datastore_stub_util
+from google.appengine.ext import ndb
+from google.appengine.ext import testbed
+
+CITIES = ['London', 'Paris', 'Tokyo', 'Chicago', 'Berlin', 'Sydney']
+TOPICS = ['Web', 'Cloud', 'Mobile', 'Data', 'Security', 'Games']
+SESSION_TYPES = ['Lecture', 'Workshop', 'Keynote', 'Panel']
+
+_current = threading.local()    # user and RPC counters of the calling thread
+
+
+def currentUser():
+    """Stand-in for endpoints.get_current_user()."""
+    return getattr(_current, 'user', None)
+
+
+def countRpc(service, call, request, response):
+    """apiproxy post-call hook counting datastore RPCs per thread."""
+    counts = getattr(_current, 'rpcs', None)
+    if counts is not None and service == 'datastore_v3':
+        counts[call] += 1
+
+
+def setUp():
+    """Activate the testbed stubs and return the testbed."""
+    bed = testbed.Testbed()
+    bed.activate()
+    policy = datastore_stub_util.PseudoRandomHRConsistencyPolicy(probability=1)
+    bed.init_datastore_v3_stub(consistency_policy=policy)
+    bed.init_memcache_stub()
+    bed.init_taskqueue_stub(root_path=ROOT)
+    bed.init_mail_stub()
+    bed.init_urlfetch_stub()
+    bed.init_user_stub()
+    os.environ.setdefault('AUTH_DOMAIN', 'gmail.com')
+    endpoints.get_current_user = currentUser
+    apiproxy_stub_map.apiproxy.GetPostCallHooks().Append(
+        'loadtest_rpcs', countRpc)
+    return bed
+
+
+def seed(options):
+    """Store options.profiles Profiles, options.conferences Conferences
+    and options.sessions Sessions per Conference; return their keys."""
+    from models import Conference
+    from models import Profile
+    from models import Session
+    from models import SpeakerSessions
+    from conference import ConferenceApi
+
+    rand = random.Random(options.seed)
+    profiles = [Profile(key=ndb.Key(Profile, 'user%d@example.com' % i),
+                        displayName='User %d' % i,
+                        mainEmail='user%d@example.com' % i,
+                        teeShirtSize='NOT_SPECIFIED')
+                for i in range(options.profiles)]
+    ndb.put_multi(profiles)
+
+    confs = []
+    for i in range(options.conferences):
+        organizer = profiles[i % len(profiles)]
+        month = 1 + i % 12
+        seats = rand.choice([10, 50, 200, 1000])
+        confs.append(Conference(
+            parent=organizer.key,
+            name='Conference %d' % i,
+            description='Conference number %d' % i,
+            organizerUserId=organizer.key.id(),
+            organizerDisplayName=organizer.displayName,
+            topics=rand.sample(TOPICS, 2),
+            city=rand.choice(CITIES),
+            startDate=date(2020, month, 1),
+            endDate=date(2020, month, 3),
+            month=month,
+            maxAttendees=seats,
+            seatsAvailable=seats))
+    c_keys = ndb.put_multi(confs)
+
+    sessions = []
+    speakers = {}
+    for c_key in c_keys:
+        for j in range(options.sessions):
+            speaker = 'Speaker %d' % rand.randrange(options.sessions * 4)
+            session = Session(parent=c_key,
+                name='Session %d' % j,
+                highlights='Highlights of session %d' % j,
+                speaker=speaker,
+                duration=rand.choice([30, 60, 90]),
+                typeOfSession=rand.choice(SESSION_TYPES),
+                date=date(2020, 1 + j % 12, 1 + j % 3),
+                startTime=dtime(9 + j % 8, 0))
+            sessions.append(session)
+            speakers.setdefault((c_key, speaker), []).append(session.name)
+    s_keys = ndb.put_multi(sessions)
+    ndb.put_multi([SpeakerSessions(parent=c_key, id=speaker, sessionNames=names)
+                   for (c_key, speaker), names in speakers.items()])
+    ConferenceApi._addSpeakerSessions(sessions)
+
+    return [p.key for p in profiles], c_keys, s_keys
+
+
+def call(api, name, message_cls, **fields):
+    """Return a thunk calling endpoint name with a message_cls request."""
+    method = getattr(api, name)
+    def thunk():
+        return method(message_cls(**fields))
+    thunk.endpoint = name
+    return thunk
+
+
+def containerOf(name):
+    """Return the request message class of ConferenceApi.<name>."""
+    from conference import ConferenceApi
+    return getattr(ConferenceApi, name).remote.request_type
+
+
+def registrationStorm(api, rand, data):
+    """Many users registering for (and dropping) a handful of hot conferences."""
+    p_keys, c_keys, s_keys = data
+    request = containerOf('registerForConference')
+    hot = c_keys[:max(1, len(c_keys) // 50)]
+    name = rand.choice(['registerForConference'] * 4 +
+                       ['unregisterFromConference'])
+    return rand.choice(p_keys), call(api, name, request,
+        websafeConferenceKey=rand.choice(hot).urlsafe())
+
+
+def queryFlood(api, rand, data):
+    """Conference list views with random filters."""
+    from models import ConferenceQueryForm
+    from models import ConferenceQueryForms
+    p_keys, c_keys, s_keys = data
+    filters = rand.choice([
+        [],
+        [ConferenceQueryForm(field='CITY', operator='EQ',
+                             value=rand.choice(CITIES))],
+        [ConferenceQueryForm(field='TOPIC', operator='EQ',
+                             value=rand.choice(TOPICS))],
+        [ConferenceQueryForm(field='MONTH', operator='GT',
+                             value=str(rand.randrange(12)))],
+        [ConferenceQueryForm(field='CITY', operator='EQ',
+                             value=rand.choice(CITIES)),
+         ConferenceQueryForm(field='MAX_ATTENDEES', operator='GT',
+                             value='20')],
+    ])
+    thunk = rand.choice([
+        call(api, 'queryConferences', ConferenceQueryForms,
+             filters=filters, pageSize=20),
+        call(api, 'queryConferenceSummaries', ConferenceQueryForms,
+             filters=filters, pageSize=20),
+        call(api, 'getConference', containerOf('getConference'),
+             websafeConferenceKey=rand.choice(c_keys).urlsafe()),
+    ])
+    return rand.choice(p_keys), thunk
+
+
+def agendaBrowsing(api, rand, data):
+    """Attendees browsing the sessions of a conference."""
+    from models import SessionsByDateForm
+    from models import SessionsBySpeakerForm
+    from models import SessionsByTypeForm
+    p_keys, c_keys, s_keys = data
+    wsck = rand.choice(c_keys).urlsafe()
+    thunk = rand.choice([
+        call(api, 'getConferenceSessions', containerOf('getConferenceSessions'),
+             websafeConferenceKey=wsck),
+        call(api, 'getConferenceSessionsByType', SessionsByTypeForm,
+             websafeConferenceKey=wsck,
+             typeOfSession=rand.choice(SESSION_TYPES)),
+        call(api, 'getConferenceSessionsByDate', SessionsByDateForm,
+             websafeConferenceKey=wsck, date=20200101),
+        call(api, 'getConferenceSessionsBySpeaker', SessionsBySpeakerForm,
+             speaker='Speaker %d' % rand.randrange(40)),
+        call(api, 'getConference', containerOf('getConference'),
+             websafeConferenceKey=wsck),
+    ])
+    return rand.choice(p_keys), thunk
+
+
+def profileChurn(api, rand, data):
+    """Profiles, attendance lists and the announcement."""
+    p_keys, c_keys, s_keys = data
+    name = rand.choice(['getProfile', 'getConferencesToAttend',
+                        'getConferenceSummariesToAttend', 'getAnnouncement'])
+    return rand.choice(p_keys), call(api, name, message_types.VoidMessage)
+
+
+SCENARIOS = collections.OrderedDict([
+    ('registration', registrationStorm),
+    ('query', queryFlood),
+    ('agenda', agendaBrowsing),
+    ('profile', profileChurn),
+])
+
+
+class Stats(object):
+    """Stats -- latencies, datastore RPCs and errors per endpoint"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = collections.defaultdict(list)
+        self.rpcs = collections.defaultdict(collections.Counter)
+        self.errors = collections.defaultdict(collections.Counter)
+
+    def record(self, endpoint, seconds, rpcs, error=None):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            self.rpcs[endpoint].update(rpcs)
+            if error:
+                self.errors[endpoint][error] += 1
+
+    def report(self, title, wall):
+        calls = sum(len(v) for v in self.latencies.values())
+        print
+        print '%s: %d calls in %.2f s (%.1f calls/s)' % (
+            title, calls, wall, calls / wall if wall else 0)
+        print '%-32s %6s %8s %8s %8s %8s  %s' % (
+            'endpoint', 'calls', 'p50 ms', 'p95 ms', 'p99 ms', 'ds rpcs',
+            'errors')
+        for endpoint in sorted(self.latencies):
+            latencies = sorted(self.latencies[endpoint])
+            rpcs = self.rpcs[endpoint]
+            print '%-32s %6d %8.2f %8.2f %8.2f %8.1f  %s' % (
+                endpoint, len(latencies),
+                percentile(latencies, 50) * 1000,
+                percentile(latencies, 95) * 1000,
+                percentile(latencies, 99) * 1000,
+                sum(rpcs.values()) / float(len(latencies)),
+                ', '.join('%s=%d' % e for e in self.errors[endpoint].items()))
+            print '%-32s %s' % ('', ' '.join('%s=%.1f' % (
+                rpc, n / float(len(latencies))) for rpc, n in sorted(rpcs.items())))
+        failures = collections.Counter()
+        for errors in self.errors.values():
+            failures.update(errors)
+        print '%d failed calls%s' % (sum(failures.values()), ''.join(
+            '%s %s=%d' % (',' if i else ':', error, n)
+            for i, (error, n) in enumerate(failures.most_common())))
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return 0.0
+    rank = int(round(p / 100.0 * len(values) + 0.5)) - 1
+    return values[min(max(rank, 0), len(values) - 1)]
+
+
+def worker(api, scenario, data, requests, seed, stats):
+    """Issue requests calls of scenario from this thread."""
+    rand = random.Random(seed)
+    for i in range(requests):
+        p_key, thunk = scenario(api, rand, data)
+        _current.user = users.User(email=p_key.id(), _auth_domain='gmail.com')
+        _current.rpcs = collections.Counter()
+        error = None
+        start = time.time()
+        try:
+            ndb.toplevel(thunk)()
+        except Exception as e:
+            # endpoint errors and crashes alike count as failures of the call
+            error = type(e).__name__
+        seconds = time.time() - start
+        stats.record(thunk.endpoint, seconds, _current.rpcs, error)
+        _current.rpcs = None
+
+
+def runTasks(bed):
+    """Run queued tasks through the webapp2 app; return how many ran."""
+    import main
+    stub = bed.get_stub(testbed.TASKQUEUE_SERVICE_NAME)
+    ran = 0
+    while True:
+        tasks = [(queue['name'], task) for queue in stub.GetQueues()
+                 for task in stub.GetTasks(queue['name'])]
+        if not tasks:
+            return ran
+        for queue_name, task in tasks:
+            stub.DeleteTask(queue_name, task['name'])
+            request = webapp2.Request.blank(task['url'],
+                method=task.get('method', 'POST'),
+                body=base64.b64decode(task['body']) if task.get('body') else '',
+                headers=dict(task.get('headers', [])))
+            ndb.toplevel(request.get_response)(main.app)
+            ran += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--profiles', type=int, default=500)
+    parser.add_argument('--conferences', type=int, default=200)
+    parser.add_argument('--sessions', type=int, default=10,
+                        help='sessions per conference')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=400,
+                        help='calls per scenario')
+    parser.add_argument('--scenario', action='append',
+                        choices=SCENARIOS.keys(),
+                        help='scenario to run, may be repeated (default all)')
+    parser.add_argument('--seed', type=int, default=1)
+    options = parser.parse_args()
+
+    bed = setUp()
+    from conference import ConferenceApi
+    try:
+        start = time.time()
+        data = seed(options)
+        print 'seeded %d profiles, %d conferences, %d sessions in %.2f s' % (
+            len(data[0]), len(data[1]), len(data[2]), time.time() - start)
+
+        api = ConferenceApi()
+        for name in options.scenario or SCENARIOS.keys():
+            stats = Stats()
+            per_thread = max(1, options.requests // options.threads)
+            threads = [threading.Thread(target=worker,
+                           args=(api, SCENARIOS[name], data, per_thread,
+                                 options.seed * 1000 + i, stats))
+                       for i in range(options.threads)]
+            start = time.time()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            stats.report('%s (%d threads)' % (name, options.threads),
+                         time.time() - start)
+            print '%d queued tasks run' % runTasks(bed)
+    finally:
+        bed.deactivate()
+
+
+if __name__ == '__main__':
+    main()
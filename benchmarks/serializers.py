@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+
+"""
+serializers.py -- micro-benchmark of the compiled ConferenceForm/SessionForm
+    copy plans against the reflective copy loops they replaced
+
+Run from the repository root with the App Engine SDK available:
+
+    GAE_SDK=/path/to/google_appengine python benchmarks/serializers.py [rows]
+
+"""
+
+import os
+import sys
+import timeit
+from datetime import date
+from datetime import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+if os.environ.get('GAE_SDK'):
+    sys.path.insert(0, os.environ['GAE_SDK'])
+    import dev_appserver
+    dev_appserver.fix_sys_path()
+os.environ.setdefault('APPLICATION_ID', 'dev~benchmark')
+
+from google.appengine.ext import ndb
+from protorpc import protojson
+
+from conference import ConferenceApi
+from models import Conference
+from models import ConferenceForm
+from models import Profile
+from models import Session
+from models import SessionForm
+
+
+def legacyCopyConferenceToForm(conf, displayName=None):
+    """_copyConferenceToForm as it was before the compiled copy plans."""
+    cf = ConferenceForm()
+    for field in cf.all_fields():
+        if hasattr(conf, field.name):
+            if field.name.endswith('Date'):
+                if getattr(conf, field.name):
+                    setattr(cf, field.name, str(getattr(conf, field.name)))
+            else:
+                setattr(cf, field.name, getattr(conf, field.name))
+        elif field.name == "websafeKey":
+            setattr(cf, field.name, conf.key.urlsafe())
+    if displayName:
+        setattr(cf, 'organizerDisplayName', displayName)
+    cf.check_initialized()
+    return cf
+
+
+def legacyCopySessionToForm(session):
+    """_copySessionToForm as it was before the compiled copy plans."""
+    sf = SessionForm()
+    for field in sf.all_fields():
+        if hasattr(session, field.name):
+            if field.name in ('date', 'startTime'):
+                if getattr(session, field.name):
+                    setattr(sf, field.name, str(getattr(session, field.name)))
+            else:
+                setattr(sf, field.name, getattr(session, field.name))
+        elif field.name == "websafeKey":
+            setattr(sf, field.name, session.key.urlsafe())
+    sf.check_initialized()
+    return sf
+
+
+def makeRows(rows):
+    """Return in-memory (unsaved) conferences and sessions to copy."""
+    confs = []
+    sessions = []
+    for i in range(rows):
+        p_key = ndb.Key(Profile, 'organizer%d@example.com' % (i % 25))
+        c_key = ndb.Key(Conference, i + 1, parent=p_key)
+        confs.append(Conference(key=c_key,
+            name='Conference %d' % i,
+            description='Description of conference %d' % i,
+            organizerUserId=p_key.id(),
+            organizerDisplayName='Organizer %d' % (i % 25),
+            topics=['Topic %d' % (i % 7), 'Topic %d' % (i % 11)],
+            city='City %d' % (i % 13),
+            startDate=date(2020, 1 + i % 12, 1),
+            endDate=date(2020, 1 + i % 12, 3),
+            month=1 + i % 12,
+            maxAttendees=100 + i,
+            seatsAvailable=i))
+        sessions.append(Session(key=ndb.Key(Session, i + 1, parent=c_key),
+            name='Session %d' % i,
+            highlights='Highlights %d' % i,
+            speaker='Speaker %d' % (i % 40),
+            duration=60,
+            typeOfSession='Workshop' if i % 2 else 'Lecture',
+            date=date(2020, 1 + i % 12, 2),
+            startTime=time(9 + i % 8, 30)))
+    return confs, sessions
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    repeat = 20
+    confs, sessions = makeRows(rows)
+    api = ConferenceApi()
+
+    # both versions must produce the same messages
+    for conf in confs:
+        assert protojson.encode_message(legacyCopyConferenceToForm(conf)) == \
+            protojson.encode_message(api._copyConferenceToForm(conf))
+    for session in sessions:
+        assert protojson.encode_message(legacyCopySessionToForm(session)) == \
+            protojson.encode_message(api._copySessionToForm(session))
+
+    cases = [
+        ('ConferenceForm', confs,
+            legacyCopyConferenceToForm, api._copyConferenceToForm),
+        ('SessionForm', sessions,
+            legacyCopySessionToForm, api._copySessionToForm),
+    ]
+    print '%d rows, best of %d runs' % (rows, repeat)
+    for name, entities, legacy, compiled in cases:
+        before = min(timeit.repeat(lambda: [legacy(e) for e in entities],
+            number=1, repeat=repeat))
+        after = min(timeit.repeat(lambda: [compiled(e) for e in entities],
+            number=1, repeat=repeat))
+        print '%-15s reflective %7.2f ms   compiled %7.2f ms   %.1fx' % (
+            name, before * 1000, after * 1000, before / after)
+
+
+if __name__ == '__main__':
+    main()
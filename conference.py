@@ -14,27 +14,55 @@ __author__ = 'wesc+api@google.com (Wesley Chun)'
 
 
 from datetime import datetime
+from datetime import timedelta
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+import uuid
+import zlib
 
 import endpoints
 from protorpc import messages
 from protorpc import message_types
 from protorpc import remote
+from protorpc import protojson
 
 from google.appengine.api import memcache
+from google.appengine.api import search
 from google.appengine.api import taskqueue
+from google.appengine.api import datastore_errors
+from google.appengine.datastore.datastore_query import Cursor
 from google.appengine.ext import ndb
 
 from models import ConflictException
 from models import Profile
+from models import Registration
+from models import AttendeeForm
+from models import AttendeeForms
+from models import AttendanceForm
+from models import WaitlistEntry
+from models import WaitlistCount
+from models import WaitlistPositionForm
+from models import GroupBooking
+from models import GroupBookingForm
+from models import GroupBookingResultForm
 from models import ProfileMiniForm
 from models import ProfileForm
 from models import StringMessage
 from models import BooleanMessage
+from models import CacheStatsForm
 from models import Conference
+from models import SeatShard
+from models import AnnouncementIndex
 from models import ConferenceForm
 from models import ConferenceForms
 from models import ConferenceQueryForm
 from models import ConferenceQueryForms
+from models import ConferenceSummaryForm
+from models import ConferenceSummaryForms
 from models import TeeShirtSize
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 from models import Session
@@ -44,7 +72,14 @@ from models import SessionsByTypeForm
 from models import SessionsByNameForm
 from models import SessionsByDateForm
 from models import SessionsBySpeakerForm
+from models import SessionQueryForm
+from models import SpeakerSessions
+from models import Speaker
+from models import SpeakerForm
+from models import SpeakerForms
+from models import SpeakerQueryForm
 from models import WishlistForm
+from models import SearchForm
 from google.net.proto.ProtocolBuffer import ProtocolBufferDecodeError
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 from settings import WEB_CLIENT_ID
@@ -53,14 +88,68 @@ from settings import IOS_CLIENT_ID
 from settings import ANDROID_AUDIENCE
 
 from utils import getUserId
+from utils import compileFormCopier
+from utils import stringOrNone
+from utils import websafeKey
+from utils import getGenerationCached
+from utils import setGenerationCached
+from utils import nextGeneration
+
+from instrumentation import instrumented
 
 EMAIL_SCOPE = endpoints.EMAIL_SCOPE
 API_EXPLORER_CLIENT_ID = endpoints.API_EXPLORER_CLIENT_ID
 MEMCACHE_ANNOUNCEMENTS_KEY = "RECENT_ANNOUNCEMENTS"
 ANNOUNCEMENT_TPL = ('Last chance to attend! The following conferences '
                     'are nearly sold out: %s')
+NEARLY_SOLD_OUT_SEATS = 5
+NEARLY_SOLD_OUT_ID = "nearly_sold_out"
+# the hourly cron rechecks conferences changed within this many hours
+NEARLY_SOLD_OUT_RECHECK_HOURS = 2
 MEMCACHE_SPEAKER_KEY = "FEATURED_SPEAKER"
 SPEAKER_TPL = ('The featured speaker for this session is: %s!')
+MAX_PAGE_SIZE = 100
+ORGANIZER_BATCH_SIZE = 100
+MEMCACHE_CONFERENCE_KEY_PREFIX = "CONFERENCE_"
+MEMCACHE_CONFERENCE_HITS_KEY = "CONFERENCE_CACHE_HITS"
+MEMCACHE_CONFERENCE_MISSES_KEY = "CONFERENCE_CACHE_MISSES"
+# fraction of getConference calls counted in the hit/miss counters
+CACHE_STATS_SAMPLE_RATE = 0.1
+CONFERENCE_CACHE_TTL = 600
+SEAT_SHARDS = 20
+SEAT_RECONCILE_DELAY = 5
+MAX_SESSIONS_PER_REQUEST = 500
+SESSION_BATCH_SIZE = 200
+EXPORT_BATCH_SIZE = 100
+MAX_WISHLIST_SIZE = 100
+WISHLIST_MIGRATION_BATCH_SIZE = 100
+CONFERENCE_SEARCH_INDEX = "conferences"
+SESSION_SEARCH_INDEX = "sessions"
+SEARCH_BATCH_SIZE = 200         # most documents per Search API put/delete
+SEARCH_PAGE_SIZE = 20
+MAX_PREFIX_LENGTH = 20
+MAX_SEARCH_TERMS = 10
+SEARCH_INDEX_BATCH_SIZE = 50
+MEMCACHE_AGENDA_PREFIX = "AGENDA_"
+MEMCACHE_AGENDA_VERSION_PREFIX = "AGENDA_VERSION_"
+AGENDA_CACHE_TTL = 3600
+MAX_SESSION_SCAN = 1000         # sessions examined per querySessions page
+SPEAKER_BACKFILL_BATCH_SIZE = 200
+REGISTRATION_BACKFILL_BATCH_SIZE = 100
+WAITLIST_PROMOTE_DELAY = 2
+WAITLIST_PROMOTE_BATCH_SIZE = 20
+MAX_GROUP_SIZE = 100
+# profiles per group booking transaction; with a seat shard that makes
+# 21 entity groups, under the 25 allowed in a cross-group transaction
+GROUP_PROFILE_BATCH_SIZE = 20
+MEMCACHE_ATTENDING_PREFIX = "ATTENDING_"
+ATTENDING_CACHE_TTL = 300
+# after an invalidation, how long the entry cannot be re-added by a
+# request that read the Profile before the change
+ATTENDING_LOCK_SECONDS = 5
+MEMCACHE_QUERY_PREFIX = "CONFERENCE_QUERY_"
+MEMCACHE_QUERY_GENERATION_KEY = "CONFERENCE_QUERY_GENERATION"
+QUERY_CACHE_TTL = 60
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 
 DEFAULTS = {
@@ -95,6 +184,28 @@ FIELDS =    {
             'MAX_ATTENDEES': 'maxAttendees',
             }
 
+# field copy plans, compiled once for the _copy*ToForm helpers
+copyConferenceToForm = compileFormCopier(ConferenceForm, Conference, {
+    'startDate': stringOrNone('startDate'),
+    'endDate': stringOrNone('endDate'),
+    'websafeKey': websafeKey,
+})
+copySessionToForm = compileFormCopier(SessionForm, Session, {
+    'date': stringOrNone('date'),
+    'startTime': stringOrNone('startTime'),
+    'websafeKey': websafeKey,
+})
+
+# properties needed by the conference list views
+SUMMARY_PROJECTION = [
+    Conference.name,
+    Conference.city,
+    Conference.startDate,
+    Conference.endDate,
+    Conference.maxAttendees,
+    Conference.seatsAvailable,
+]
+
 CONF_GET_REQUEST = endpoints.ResourceContainer(
     message_types.VoidMessage,
     websafeConferenceKey=messages.StringField(1),
@@ -105,6 +216,18 @@ CONF_POST_REQUEST = endpoints.ResourceContainer(
     websafeConferenceKey=messages.StringField(1),
 )
 
+GROUP_BOOKING_REQUEST = endpoints.ResourceContainer(
+    GroupBookingForm,
+    websafeConferenceKey=messages.StringField(1),
+)
+
+ROSTER_GET_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    websafeConferenceKey=messages.StringField(1),
+    pageSize=messages.IntegerField(2),
+    pageToken=messages.StringField(3),
+)
+
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 
 
@@ -130,6 +253,83 @@ SESS_POST_REQUEST = endpoints.ResourceContainer(
     websafeConferenceKey=messages.StringField(1),
 )
 
+SESSS_POST_REQUEST = endpoints.ResourceContainer(
+    SessionForms,
+    websafeConferenceKey=messages.StringField(1),
+)
+
+SPEAKER_GET_REQUEST = endpoints.ResourceContainer(
+    message_types.VoidMessage,
+    speaker=messages.StringField(1),
+)
+
+
+# - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
+
+def migrateWishlist(profile):
+    """Move legacy websafe string wishlist entries of a Profile into
+    wishlistSessionKeys; return True if the profile changed."""
+    if not profile.websafeSessionKey:
+        return False
+    keys = set(profile.wishlistSessionKeys)
+    for websafe_key in profile.websafeSessionKey:
+        try:
+            s_key = ndb.Key(urlsafe=websafe_key)
+        except (ProtocolBufferDecodeError, TypeError):
+            continue
+        if s_key.kind() == 'Session' and s_key not in keys:
+            profile.wishlistSessionKeys.append(s_key)
+            keys.add(s_key)
+    profile.websafeSessionKey = []
+    return True
+
+
+class ProfileContext(object):
+    """ProfileContext -- the caller's Profile, loaded once per request
+
+    Helpers share one context instead of each re-reading the user and the
+    Profile; changes are marked with touch() and written by a single put()
+    in flush(), as is a Profile created on first access.
+    """
+
+    def __init__(self):
+        # make sure user is authed
+        self.user = endpoints.get_current_user()
+        if not self.user:
+            raise endpoints.UnauthorizedException('Authorization required')
+        self.key = ndb.Key(Profile, getUserId(self.user))
+        self.dirty = False
+        self._profile = None
+
+    @property
+    def profile(self):
+        """Return the Profile, getting (or creating) it on first access."""
+        if self._profile is None:
+            self._profile = self.key.get()
+            # create new Profile if not there
+            if not self._profile:
+                self._profile = Profile(
+                    key = self.key,
+                    displayName = self.user.nickname(),
+                    mainEmail= self.user.email(),
+                    teeShirtSize = str(TeeShirtSize.NOT_SPECIFIED),
+                )
+                self.dirty = True
+            # profiles saved before wishlists were stored as keys
+            elif migrateWishlist(self._profile):
+                self.dirty = True
+        return self._profile
+
+    def touch(self):
+        """Mark the Profile as modified."""
+        self.dirty = True
+
+    def flush(self):
+        """Write the Profile back if it was created or modified."""
+        if self.dirty:
+            self._profile.put()
+            self.dirty = False
+        return self._profile
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 
@@ -141,24 +341,39 @@ class ConferenceApi(remote.Service):
 
 # - - - Conference objects - - - - - - - - - - - - - - - - -
 
-    def _copyConferenceToForm(self, conf, displayName):
+    def _copyConferenceToForm(self, conf, displayName=None):
         """Copy relevant fields from Conference to ConferenceForm."""
-        cf = ConferenceForm()
-        for field in cf.all_fields():
-            if hasattr(conf, field.name):
-                # convert Date to date string; just copy others
-                if field.name.endswith('Date'):
-                    setattr(cf, field.name, str(getattr(conf, field.name)))
-                else:
-                    setattr(cf, field.name, getattr(conf, field.name))
-            elif field.name == "websafeKey":
-                setattr(cf, field.name, conf.key.urlsafe())
+        # dates become date strings, websafeKey the urlsafe key
+        cf = copyConferenceToForm(conf)
         if displayName:
             setattr(cf, 'organizerDisplayName', displayName)
-        cf.check_initialized()
         return cf
 
 
+    def _copyConferenceToSummaryForm(self, conf, city=None):
+        """Copy list view fields from (projected) Conference to ConferenceSummaryForm;
+        city is given when the query filtered on it and could not project it."""
+        return ConferenceSummaryForm(
+            name=conf.name,
+            city=conf.city if city is None else city,
+            startDate=str(conf.startDate) if conf.startDate else None,
+            endDate=str(conf.endDate) if conf.endDate else None,
+            maxAttendees=conf.maxAttendees,
+            seatsAvailable=conf.seatsAvailable,
+            websafeKey=conf.key.urlsafe(),
+        )
+
+
+    def _organizerNames(self, conferences):
+        """Return organizer displayNames for conferences created before
+        organizerDisplayName was stored on Conference."""
+        user_ids = list(set(conf.organizerUserId for conf in conferences
+            if conf.organizerDisplayName is None))
+        profiles = ndb.get_multi([ndb.Key(Profile, user_id) for user_id in user_ids])
+        return dict((user_id, getattr(prof, 'displayName', None))
+            for user_id, prof in zip(user_ids, profiles))
+
+
     def _createConferenceObject(self, request):
         """Create or update Conference object, returning ConferenceForm/request."""
         # preload necessary data items
@@ -170,10 +385,34 @@ class ConferenceApi(remote.Service):
         if not request.name:
             raise endpoints.BadRequestException("Conference 'name' field required")
 
+        # generate Profile Key based on user ID and Conference
+        # ID based on Profile key get Conference key from ID
+        p_key = ndb.Key(Profile, user_id)
+        c_id = Conference.allocate_ids(size=1, parent=p_key)[0]
+        c_key = ndb.Key(Conference, c_id, parent=p_key)
+        # store organizer name so reads need no Profile get
+        prof = p_key.get()
+        displayName = getattr(prof, 'displayName', None) or user.nickname()
+
+        # create Conference, send email to organizer confirming
+        # creation of Conference & return (modified) ConferenceForm
+        conf = self._conferenceFromForm(request, c_key, displayName)
+        conf.put()
+        self._indexConferences([conf])
+        self._invalidateQueryCache()
+        taskqueue.add(params={'email': user.email(),
+            'conferenceInfo': repr(request)},
+            url='/tasks/send_confirmation_email'
+        )
+        return request
+
+
+    @staticmethod
+    def _conferenceFromForm(request, c_key, displayName):
+        """Build a Conference entity (not yet stored) from a ConferenceForm."""
         # copy ConferenceForm/ProtoRPC Message into dict
         data = {field.name: getattr(request, field.name) for field in request.all_fields()}
         del data['websafeKey']
-        del data['organizerDisplayName']
 
         # add default values for those missing (both data model & outbound Message)
         for df in DEFAULTS:
@@ -193,25 +432,16 @@ class ConferenceApi(remote.Service):
         # set seatsAvailable to be same as maxAttendees on creation
         if data["maxAttendees"] > 0:
             data["seatsAvailable"] = data["maxAttendees"]
-        # generate Profile Key based on user ID and Conference
-        # ID based on Profile key get Conference key from ID
-        p_key = ndb.Key(Profile, user_id)
-        c_id = Conference.allocate_ids(size=1, parent=p_key)[0]
-        c_key = ndb.Key(Conference, c_id, parent=p_key)
-        data['key'] = c_key
-        data['organizerUserId'] = request.organizerUserId = user_id
+        # seats are handed out by SeatShards split from this total
+        data["seatShardBase"] = data["seatsAvailable"]
 
-        # create Conference, send email to organizer confirming
-        # creation of Conference & return (modified) ConferenceForm
-        Conference(**data).put()
-        taskqueue.add(params={'email': user.email(),
-            'conferenceInfo': repr(request)},
-            url='/tasks/send_confirmation_email'
-        )
-        return request
+        data['key'] = c_key
+        data['organizerUserId'] = request.organizerUserId = c_key.parent().id()
+        data['organizerDisplayName'] = request.organizerDisplayName = displayName
+        return Conference(**data)
 
 
-    @ndb.transactional()
+    @ndb.transactional(xg=True)
     def _updateConferenceObject(self, request):
         user = endpoints.get_current_user()
         if not user:
@@ -233,9 +463,17 @@ class ConferenceApi(remote.Service):
             raise endpoints.ForbiddenException(
                 'Only the owner can update the conference.')
 
+        if request.seatsAvailable is not None and request.seatsAvailable < 0:
+            raise endpoints.BadRequestException("'seatsAvailable' must not be negative.")
+        old_max = conf.maxAttendees
+
         # Not getting all the fields, so don't create a new object; just
         # copy relevant fields from ConferenceForm to Conference object
         for field in request.all_fields():
+            # organizer name is maintained from the organizer's Profile;
+            # seats are split over the SeatShards below
+            if field.name in ('organizerDisplayName', 'seatsAvailable'):
+                continue
             data = getattr(request, field.name)
             # only copy fields where we get data
             if data not in (None, []):
@@ -246,13 +484,22 @@ class ConferenceApi(remote.Service):
                         conf.month = data.month
                 # write to Conference object
                 setattr(conf, field.name, data)
+        # a new seat count, or as many more (fewer) seats as attendees were
+        # added (removed), goes to the shards in this transaction
+        if request.seatsAvailable is not None or conf.maxAttendees != old_max:
+            self._rebalanceSeatShards(conf, request.seatsAvailable,
+                (conf.maxAttendees or 0) - (old_max or 0))
         conf.put()
-        prof = ndb.Key(Profile, user_id).get()
-        return self._copyConferenceToForm(conf, getattr(prof, 'displayName'))
+        ndb.get_context().call_on_commit(
+            lambda: self._invalidateConferenceCache([request.websafeConferenceKey]))
+        ndb.get_context().call_on_commit(lambda: self._indexConferences([conf]))
+        ndb.get_context().call_on_commit(self._invalidateQueryCache)
+        return self._copyConferenceToForm(conf, self._organizerNames([conf]).get(user_id))
 
 
     @endpoints.method(ConferenceForm, ConferenceForm, path='conference',
             http_method='POST', name='createConference')
+    @instrumented
     def createConference(self, request):
         """Create new conference."""
         return self._createConferenceObject(request)
@@ -261,6 +508,7 @@ class ConferenceApi(remote.Service):
     @endpoints.method(CONF_POST_REQUEST, ConferenceForm,
             path='conference/{websafeConferenceKey}',
             http_method='PUT', name='updateConference')
+    @instrumented
     def updateConference(self, request):
         """Update conference w/provided fields & return w/updated info."""
         return self._updateConferenceObject(request)
@@ -269,21 +517,126 @@ class ConferenceApi(remote.Service):
     @endpoints.method(CONF_GET_REQUEST, ConferenceForm,
             path='conference/{websafeConferenceKey}',
             http_method='GET', name='getConference')
+    @instrumented
     def getConference(self, request):
         """Return requested conference (by websafeConferenceKey)."""
+        # serve the serialized ConferenceForm from memcache when possible
+        memcache_key = MEMCACHE_CONFERENCE_KEY_PREFIX + request.websafeConferenceKey
+        cached = memcache.get(memcache_key)
+        if cached:
+            self._countCacheLookup(MEMCACHE_CONFERENCE_HITS_KEY)
+            return protojson.decode_message(ConferenceForm, cached)
+        self._countCacheLookup(MEMCACHE_CONFERENCE_MISSES_KEY)
+
         # get Conference object from request; bail if not found
         conf = ndb.Key(urlsafe=request.websafeConferenceKey).get()
         if not conf:
             raise endpoints.NotFoundException(
                 'No conference found with key: %s' % request.websafeConferenceKey)
-        prof = conf.key.parent().get()
-        # return ConferenceForm
-        return self._copyConferenceToForm(conf, getattr(prof, 'displayName'))
+        # cache & return ConferenceForm
+        cf = self._copyConferenceToForm(conf,
+            self._organizerNames([conf]).get(conf.organizerUserId))
+        memcache.set(memcache_key, protojson.encode_message(cf),
+            time=CONFERENCE_CACHE_TTL)
+        return cf
+
+
+    @staticmethod
+    def _countCacheLookup(counter_key):
+        """Add a sampled getConference cache hit or miss to its counter,
+        scaled up by the sample rate, without waiting for the incr."""
+        if random.random() < CACHE_STATS_SAMPLE_RATE:
+            memcache.Client().incr_async(counter_key,
+                delta=int(round(1 / CACHE_STATS_SAMPLE_RATE)), initial_value=0)
+
+
+    @staticmethod
+    def _invalidateConferenceCache(websafeConferenceKeys):
+        """Drop cached ConferenceForms for the given websafe keys."""
+        if websafeConferenceKeys:
+            memcache.delete_multi(websafeConferenceKeys,
+                key_prefix=MEMCACHE_CONFERENCE_KEY_PREFIX)
+
+
+    @staticmethod
+    @ndb.transactional()
+    def _setOrganizerDisplayName(p_key, websafeCursor=None, onlyMissing=False):
+        """Copy the Profile displayName onto one batch of its conferences.
+
+        An organizer's conferences share the Profile's entity group, so a
+        batch is updated in a single transaction. Returns the websafe cursor
+        of the next batch, or None when done.
+        """
+        prof = p_key.get()
+        if not prof:
+            return None
+        cursor = Cursor(urlsafe=websafeCursor) if websafeCursor else None
+        confs, next_cursor, more = Conference.query(ancestor=p_key).fetch_page(
+            ORGANIZER_BATCH_SIZE, start_cursor=cursor)
+        changed = [conf for conf in confs
+            if conf.organizerDisplayName != prof.displayName and
+            not (onlyMissing and conf.organizerDisplayName is not None)]
+        for conf in changed:
+            conf.organizerDisplayName = prof.displayName
+        ndb.put_multi(changed)
+        ndb.get_context().call_on_commit(
+            lambda: ConferenceApi._invalidateConferenceCache(
+                [conf.key.urlsafe() for conf in changed]))
+        if changed:
+            ndb.get_context().call_on_commit(ConferenceApi._invalidateQueryCache)
+        if more and next_cursor:
+            return next_cursor.urlsafe()
+        return None
+
+
+    @staticmethod
+    def _updateOrganizerDisplayName(organizerUserId, websafeCursor=None):
+        """Propagate a displayName change to the organizer's conferences;
+        used by task queue. Requeues itself until every batch is done."""
+        next_cursor = ConferenceApi._setOrganizerDisplayName(
+            ndb.Key(Profile, organizerUserId), websafeCursor)
+        if next_cursor:
+            taskqueue.add(params={'organizerUserId': organizerUserId,
+                'websafeCursor': next_cursor},
+                url='/tasks/update_organizer_name')
+
+
+    @staticmethod
+    def _backfillOrganizerDisplayNames(websafeCursor=None):
+        """Fill organizerDisplayName on one batch of existing conferences;
+        used by the migration task. Returns the next websafe cursor."""
+        cursor = Cursor(urlsafe=websafeCursor) if websafeCursor else None
+        conf_keys, next_cursor, more = Conference.query().fetch_page(
+            ORGANIZER_BATCH_SIZE, start_cursor=cursor, keys_only=True)
+        for p_key in set(conf_key.parent() for conf_key in conf_keys):
+            # large organizers are finished off by their own task chain
+            remaining = ConferenceApi._setOrganizerDisplayName(p_key, onlyMissing=True)
+            if remaining:
+                ConferenceApi._updateOrganizerDisplayName(p_key.id(), remaining)
+        if more and next_cursor:
+            return next_cursor.urlsafe()
+        return None
+
+
+    @endpoints.method(message_types.VoidMessage, CacheStatsForm,
+            path='conference/cache/stats',
+            http_method='GET', name='getConferenceCacheStats')
+    @instrumented
+    def getConferenceCacheStats(self, request):
+        """Return getConference cache hit/miss counters, estimated from a
+        CACHE_STATS_SAMPLE_RATE sample of the calls."""
+        stats = memcache.get_multi([MEMCACHE_CONFERENCE_HITS_KEY,
+            MEMCACHE_CONFERENCE_MISSES_KEY])
+        return CacheStatsForm(
+            hits=stats.get(MEMCACHE_CONFERENCE_HITS_KEY, 0),
+            misses=stats.get(MEMCACHE_CONFERENCE_MISSES_KEY, 0),
+        )
 
 
     @endpoints.method(message_types.VoidMessage, ConferenceForms,
             path='getConferencesCreated',
             http_method='POST', name='getConferencesCreated')
+    @instrumented
     def getConferencesCreated(self, request):
         """Return conferences created by user."""
         # make sure user is authed
@@ -293,11 +646,31 @@ class ConferenceApi(remote.Service):
         user_id = getUserId(user)
 
         # create ancestor query for all key matches for this user
-        confs = Conference.query(ancestor=ndb.Key(Profile, user_id))
-        prof = ndb.Key(Profile, user_id).get()
+        confs = Conference.query(ancestor=ndb.Key(Profile, user_id)).fetch()
+        names = self._organizerNames(confs)
         # return set of ConferenceForm objects per Conference
         return ConferenceForms(
-            items=[self._copyConferenceToForm(conf, getattr(prof, 'displayName')) for conf in confs]
+            items=[self._copyConferenceToForm(conf, names.get(user_id)) for conf in confs]
+        )
+
+
+    @endpoints.method(message_types.VoidMessage, ConferenceSummaryForms,
+            path='getConferencesCreated/summary',
+            http_method='POST', name='getConferenceSummariesCreated')
+    @instrumented
+    def getConferenceSummariesCreated(self, request):
+        """Return list view summaries of conferences created by user."""
+        # make sure user is authed
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException('Authorization required')
+        user_id = getUserId(user)
+
+        # projection query; served from the index without entity reads
+        confs = Conference.query(ancestor=ndb.Key(Profile, user_id)).fetch(
+            projection=SUMMARY_PROJECTION)
+        return ConferenceSummaryForms(
+            items=[self._copyConferenceToSummaryForm(conf) for conf in confs]
         )
 
 
@@ -349,31 +722,352 @@ class ConferenceApi(remote.Service):
         return (inequality_field, formatted_filters)
 
 
+    @staticmethod
+    def _queryCacheKey(request, mode):
+        """Return the memcache key of a query result: a hash of the filters
+        (sorted, duplicates dropped, numbers normalized), page & mode."""
+        filters = set()
+        for f in request.filters:
+            value = f.value
+            if FIELDS.get(f.field) in ("month", "maxAttendees"):
+                try:
+                    value = str(int(value))
+                except (TypeError, ValueError):
+                    pass
+            filters.add((f.field, f.operator, value))
+        canonical = json.dumps({
+            'filters': sorted(filters),
+            'pageSize': request.pageSize,
+            'pageToken': request.pageToken,
+            'mode': mode,
+        }, sort_keys=True)
+        return MEMCACHE_QUERY_PREFIX + hashlib.sha1(canonical).hexdigest()
+
+
+    @staticmethod
+    def _invalidateQueryCache():
+        """Start a new query cache generation after conferences were
+        created, edited or renamed; seat counts only expire with the TTL."""
+        nextGeneration(MEMCACHE_QUERY_GENERATION_KEY)
+
+
+    @ndb.tasklet
+    def _fetchQueryAsync(self, request, callback=None, **options):
+        """Run the filtered query once, passing each result to callback as
+        it streams in; pages with pageSize/pageToken when pageSize is given.
+        Returns the results and the next page token.
+        """
+        page_size = None
+        if request.pageSize is not None:
+            page_size = min(request.pageSize, MAX_PAGE_SIZE)
+            if page_size <= 0:
+                raise endpoints.BadRequestException("'pageSize' must be positive.")
+            # "!=" runs as several merged queries, which cannot be paged
+            if any(OPERATORS.get(f.operator) == '!=' for f in request.filters):
+                raise endpoints.BadRequestException(
+                    "'NE' filters cannot be combined with 'pageSize'.")
+            try:
+                cursor = Cursor(urlsafe=request.pageToken) if request.pageToken else None
+            except datastore_errors.BadValueError:
+                raise endpoints.BadRequestException("Invalid 'pageToken'.")
+            # same trick as Query.fetch_page: ask for one extra result to
+            # find out whether there is a next page
+            options.update(limit=page_size + 1, batch_size=page_size,
+                produce_cursors=True, start_cursor=cursor)
+
+        results = []
+        next_page_token = None
+        it = self._getQuery(request).iter(**options)
+        try:
+            while (yield it.has_next_async()):
+                result = it.next()
+                if callback:
+                    callback(result)
+                results.append(result)
+                if page_size and len(results) >= page_size:
+                    break
+            if page_size and it.probably_has_next():
+                next_page_token = it.cursor_after().urlsafe()
+        except (datastore_errors.BadArgumentError, datastore_errors.BadRequestError):
+            if not page_size:
+                raise
+            # cursors issued for a different set of filters
+            raise endpoints.BadRequestException(
+                "'pageToken' does not match the submitted filters.")
+        raise ndb.Return(results, next_page_token)
+
+
+    def _fetchQuery(self, request, **options):
+        """Run the filtered query, one page at a time if pageSize is given."""
+        return self._fetchQueryAsync(request, **options).get_result()
+
+
     @endpoints.method(ConferenceQueryForms, ConferenceForms,
             path='queryConferences',
             http_method='POST',
             name='queryConferences')
+    @instrumented
     def queryConferences(self, request):
-        """Query for conferences."""
-        conferences = self._getQuery(request)
-
-        # need to fetch organiser displayName from profiles
-        # get all keys and use get_multi for speed
-        organisers = [(ndb.Key(Profile, conf.organizerUserId)) for conf in conferences]
-        profiles = ndb.get_multi(organisers)
+        """Query for conferences, one page at a time if pageSize is given."""
+        # popular filter sets are served from memcache for QUERY_CACHE_TTL
+        cache_key = self._queryCacheKey(request, 'full')
+        generation, cached = getGenerationCached(MEMCACHE_QUERY_GENERATION_KEY, cache_key)
+        if cached is not None:
+            return protojson.decode_message(ConferenceForms, cached)
+
+        # conferences not yet backfilled with organizerDisplayName need it
+        # from the profile; start one get per distinct organiser as soon as
+        # its first conference streams in (ndb batches the gets issued
+        # together into one RPC)
+        organisers = {}
+        def fetchOrganiser(conf):
+            if conf.organizerDisplayName is None and \
+                    conf.organizerUserId not in organisers:
+                organisers[conf.organizerUserId] = \
+                    ndb.Key(Profile, conf.organizerUserId).get_async()
+
+        conferences, next_page_token = self._fetchQueryAsync(
+            request, fetchOrganiser).get_result()
 
         # put display names in a dict for easier fetching
         names = {}
-        for profile in profiles:
-            names[profile.key.id()] = profile.displayName
+        for user_id, future in organisers.items():
+            names[user_id] = getattr(future.get_result(), 'displayName', None)
 
         # return individual ConferenceForm object per Conference
+        forms = ConferenceForms(
+                items=[self._copyConferenceToForm(conf, names.get(conf.organizerUserId)) for conf in \
+                conferences],
+                nextPageToken=next_page_token
+        )
+        setGenerationCached(cache_key, generation, protojson.encode_message(forms),
+            QUERY_CACHE_TTL)
+        return forms
+
+
+    @endpoints.method(ConferenceQueryForms, ConferenceSummaryForms,
+            path='queryConferences/summary',
+            http_method='POST',
+            name='queryConferenceSummaries')
+    @instrumented
+    def queryConferenceSummaries(self, request):
+        """Query for list view summaries of conferences."""
+        cache_key = self._queryCacheKey(request, 'summary')
+        generation, cached = getGenerationCached(MEMCACHE_QUERY_GENERATION_KEY, cache_key)
+        if cached is not None:
+            return protojson.decode_message(ConferenceSummaryForms, cached)
+
+        # properties under an equality filter cannot be projected; the city
+        # of a city filter is its value, other filters need the entities
+        cities = set(f.value for f in request.filters)
+        city = None
+        if not request.filters:
+            conferences, next_page_token = self._fetchQuery(request,
+                projection=SUMMARY_PROJECTION)
+        elif len(cities) == 1 and all(f.field == 'CITY' and f.operator == 'EQ'
+                for f in request.filters):
+            city = cities.pop()
+            conferences, next_page_token = self._fetchQuery(request,
+                projection=[prop for prop in SUMMARY_PROJECTION
+                    if prop is not Conference.city])
+        else:
+            # keys-only, so get_multi can be served by ndb's memcache
+            keys, next_page_token = self._fetchQuery(request, keys_only=True)
+            conferences = [conf for conf in ndb.get_multi(keys) if conf]
+
+        forms = ConferenceSummaryForms(
+            items=[self._copyConferenceToSummaryForm(conf, city) for conf in conferences],
+            nextPageToken=next_page_token
+        )
+        setGenerationCached(cache_key, generation, protojson.encode_message(forms),
+            QUERY_CACHE_TTL)
+        return forms
+
+
+# - - - Search - - - - - - - - - - - - - - - - - - - - - - -
+
+    @staticmethod
+    def _searchTokens(*texts):
+        """Split texts into lowercase word tokens."""
+        tokens = []
+        for text in texts:
+            if text:
+                tokens.extend(re.findall(r'\w+', text.lower(), re.UNICODE))
+        return tokens
+
+
+    @staticmethod
+    def _searchPrefixes(*texts):
+        """Return every prefix of every token of texts, space separated; the
+        Search API only matches whole words, so prefixes are indexed."""
+        prefixes = set()
+        for token in ConferenceApi._searchTokens(*texts):
+            for i in range(1, min(len(token), MAX_PREFIX_LENGTH) + 1):
+                prefixes.add(token[:i])
+        return ' '.join(sorted(prefixes))
+
+
+    @staticmethod
+    def _conferenceDocument(conf):
+        """Build the search Document of a Conference."""
+        topics = ' '.join(conf.topics or [])
+        return search.Document(doc_id=conf.key.urlsafe(), fields=[
+            search.TextField(name='name', value=conf.name),
+            search.TextField(name='description', value=conf.description),
+            search.TextField(name='topics', value=topics),
+            search.AtomField(name='city', value=conf.city),
+            search.TextField(name='prefixes', value=ConferenceApi._searchPrefixes(
+                conf.name, conf.description, topics, conf.city)),
+        ])
+
+
+    @staticmethod
+    def _sessionDocument(session):
+        """Build the search Document of a Session."""
+        return search.Document(doc_id=session.key.urlsafe(), fields=[
+            search.TextField(name='name', value=session.name),
+            search.TextField(name='speaker', value=session.speaker),
+            search.AtomField(name='typeOfSession', value=session.typeOfSession),
+            search.AtomField(name='conference', value=session.key.parent().urlsafe()),
+            search.TextField(name='prefixes', value=ConferenceApi._searchPrefixes(
+                session.name, session.speaker)),
+        ])
+
+
+    @staticmethod
+    def _indexDocuments(index_name, documents):
+        """Put documents into a search index, SEARCH_BATCH_SIZE at a time.
+        Failures are logged, not raised: the datastore write has already
+        happened and the index can be rebuilt with /tasks/index_search."""
+        index = search.Index(name=index_name)
+        for i in range(0, len(documents), SEARCH_BATCH_SIZE):
+            try:
+                index.put(documents[i:i + SEARCH_BATCH_SIZE])
+            except search.Error:
+                logging.exception('Could not index %d documents in %s',
+                    len(documents[i:i + SEARCH_BATCH_SIZE]), index_name)
+
+
+    @staticmethod
+    def _unindexDocuments(index_name, doc_ids):
+        """Delete documents from a search index."""
+        index = search.Index(name=index_name)
+        for i in range(0, len(doc_ids), SEARCH_BATCH_SIZE):
+            try:
+                index.delete(doc_ids[i:i + SEARCH_BATCH_SIZE])
+            except search.Error:
+                logging.exception('Could not remove documents from %s', index_name)
+
+
+    @staticmethod
+    def _indexConferences(conferences):
+        """(Re)index conferences after they were written."""
+        ConferenceApi._indexDocuments(CONFERENCE_SEARCH_INDEX,
+            [ConferenceApi._conferenceDocument(conf) for conf in conferences])
+
+
+    @staticmethod
+    def _indexSessions(sessions):
+        """(Re)index sessions after they were written."""
+        ConferenceApi._indexDocuments(SESSION_SEARCH_INDEX,
+            [ConferenceApi._sessionDocument(session) for session in sessions])
+
+
+    @staticmethod
+    def _search(index_name, request, restrict=None):
+        """Run a prefix search for every term of request.query, best
+        matches first; returns the matching keys and the next page token."""
+        terms = ConferenceApi._searchTokens(request.query)[:MAX_SEARCH_TERMS]
+        if not terms:
+            raise endpoints.BadRequestException("'query' must contain a word.")
+        page_size = min(request.pageSize or SEARCH_PAGE_SIZE, MAX_PAGE_SIZE)
+        if page_size <= 0:
+            raise endpoints.BadRequestException("'pageSize' must be positive.")
+
+        clauses = ['prefixes:"%s"' % term[:MAX_PREFIX_LENGTH] for term in terms]
+        for field, value in sorted((restrict or {}).items()):
+            clauses.append('%s:"%s"' % (field, value.replace('"', '')))
+        try:
+            query = search.Query(query_string=' AND '.join(clauses),
+                options=search.QueryOptions(
+                    limit=page_size,
+                    ids_only=True,
+                    cursor=search.Cursor(web_safe_string=request.pageToken)
+                        if request.pageToken else search.Cursor(),
+                    sort_options=search.SortOptions(
+                        match_scorer=search.MatchScorer(),
+                        expressions=[search.SortExpression(expression='_score',
+                            direction=search.SortExpression.DESCENDING,
+                            default_value=0)])))
+            results = search.Index(name=index_name).search(query)
+        except (ValueError, search.QueryError):
+            raise endpoints.BadRequestException("Invalid 'query' or 'pageToken'.")
+
+        keys = [ndb.Key(urlsafe=doc.doc_id) for doc in results.results]
+        next_page_token = results.cursor.web_safe_string if results.cursor else None
+        return keys, next_page_token
+
+
+    @staticmethod
+    def _getSearchResults(index_name, keys):
+        """Get the entities of search results in rank order, dropping the
+        documents of entities that no longer exist."""
+        entities = ndb.get_multi(keys)
+        stale = [key.urlsafe() for key, entity in zip(keys, entities) if not entity]
+        if stale:
+            ConferenceApi._unindexDocuments(index_name, stale)
+        return [entity for entity in entities if entity]
+
+
+    @endpoints.method(SearchForm, ConferenceForms,
+            path='search/conferences',
+            http_method='POST', name='searchConferences')
+    @instrumented
+    def searchConferences(self, request):
+        """Search conference names, descriptions, topics & cities by word prefixes."""
+        keys, next_page_token = self._search(CONFERENCE_SEARCH_INDEX, request)
+        conferences = self._getSearchResults(CONFERENCE_SEARCH_INDEX, keys)
+        names = self._organizerNames(conferences)
         return ConferenceForms(
-                items=[self._copyConferenceToForm(conf, names[conf.organizerUserId]) for conf in \
-                conferences]
+            items=[self._copyConferenceToForm(conf, names.get(conf.organizerUserId))
+                for conf in conferences],
+            nextPageToken=next_page_token
+        )
+
+
+    @endpoints.method(SearchForm, SessionForms,
+            path='search/sessions',
+            http_method='POST', name='searchSessions')
+    @instrumented
+    def searchSessions(self, request):
+        """Search session names & speakers by word prefixes, optionally
+        within one conference."""
+        restrict = {}
+        if request.websafeConferenceKey:
+            restrict['conference'] = request.websafeConferenceKey
+        keys, next_page_token = self._search(SESSION_SEARCH_INDEX, request, restrict)
+        sessions = self._getSearchResults(SESSION_SEARCH_INDEX, keys)
+        return SessionForms(
+            items=[self._copySessionToForm(session) for session in sessions],
+            nextPageToken=next_page_token
         )
 
 
+    @staticmethod
+    def _indexSearchDocuments(websafeCursor=None):
+        """Index one batch of conferences and their sessions; used to build
+        the search indexes for existing data. Returns the websafe cursor of
+        the next batch, or None when done."""
+        cursor = Cursor(urlsafe=websafeCursor) if websafeCursor else None
+        confs, next_cursor, more = Conference.query().fetch_page(
+            SEARCH_INDEX_BATCH_SIZE, start_cursor=cursor)
+        futures = [Session.query(ancestor=conf.key).fetch_async() for conf in confs]
+        ConferenceApi._indexConferences(confs)
+        for future in futures:
+            ConferenceApi._indexSessions(future.get_result())
+        return next_cursor.urlsafe() if more and next_cursor else None
+
+
 # - - - Profile objects - - - - - - - - - - - - - - - - - - -
 
     def _copyProfileToForm(self, prof):
@@ -387,38 +1081,30 @@ class ConferenceApi(remote.Service):
                     setattr(pf, field.name, getattr(TeeShirtSize, getattr(prof, field.name)))
                 else:
                     setattr(pf, field.name, getattr(prof, field.name))
+        # wishlist is stored as Session keys
+        pf.websafeSessionKey = [s_key.urlsafe() for s_key in prof.wishlistSessionKeys]
         pf.check_initialized()
         return pf
 
 
     def _getProfileFromUser(self):
         """Return user Profile from datastore, creating new one if non-existent."""
-        # make sure user is authed
-        user = endpoints.get_current_user()
-        if not user:
-            raise endpoints.UnauthorizedException('Authorization required')
-
-        # get Profile from datastore
-        user_id = getUserId(user)
-        p_key = ndb.Key(Profile, user_id)
-        profile = p_key.get()
-        # create new Profile if not there
-        if not profile:
-            profile = Profile(
-                key = p_key,
-                displayName = user.nickname(),
-                mainEmail= user.email(),
-                teeShirtSize = str(TeeShirtSize.NOT_SPECIFIED),
-            )
-            profile.put()
-
+        ctx = ProfileContext()
+        profile = ctx.profile
+        ctx.flush()         # store it if newly created
         return profile      # return Profile
 
 
-    def _doProfile(self, save_request=None):
-        """Get user Profile and return to user, possibly updating it first."""
+    def _doProfile(self, save_request=None, ctx=None):
+        """Get user Profile and return to user, possibly updating it first.
+
+        Pass the request's ProfileContext as ctx to reuse its Profile; any
+        pending change is written with a single put.
+        """
         # get user Profile
-        prof = self._getProfileFromUser()
+        ctx = ctx or ProfileContext()
+        prof = ctx.profile
+        oldDisplayName = prof.displayName
 
         # if saveProfile(), process user-modifyable fields
         if save_request:
@@ -431,7 +1117,13 @@ class ConferenceApi(remote.Service):
                         #    setattr(prof, field, str(val).upper())
                         #else:
                         #    setattr(prof, field, val)
-                        prof.put()
+                        ctx.touch()
+        ctx.flush()
+
+        # organizer name is copied onto each of the user's conferences
+        if save_request and prof.displayName != oldDisplayName:
+            taskqueue.add(params={'organizerUserId': prof.key.id()},
+                url='/tasks/update_organizer_name')
 
         # return ProfileForm
         return self._copyProfileToForm(prof)
@@ -439,6 +1131,7 @@ class ConferenceApi(remote.Service):
 
     @endpoints.method(message_types.VoidMessage, ProfileForm,
             path='profile', http_method='GET', name='getProfile')
+    @instrumented
     def getProfile(self, request):
         """Return user profile."""
         return self._doProfile()
@@ -446,28 +1139,143 @@ class ConferenceApi(remote.Service):
 
     @endpoints.method(ProfileMiniForm, ProfileForm,
             path='profile', http_method='POST', name='saveProfile')
+    @instrumented
     def saveProfile(self, request):
         """Update & return user profile."""
         return self._doProfile(request)
 
 
+# - - - Bulk import/export - - - - - - - - - - - - - - - - -
+
+    @staticmethod
+    def _importConferences(lines):
+        """Create conferences and their sessions from JSON lines; used by
+        the import task. Each line holds a ConferenceForm (organizerUserId
+        required) plus an optional "sessions" list of SessionForms, i.e. the
+        format written by _exportConferences. No confirmation emails are
+        sent. A conference's key is derived from its line and it is written
+        together with its sessions, so a retried import skips the lines it
+        stored already. Returns the number of conferences created and a
+        list of errors for the lines that were skipped.
+        """
+        errors = []
+        parsed = []
+        for lineno, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                obj = json.loads(line)
+                sessions = obj.pop('sessions', None) or []
+                cf = protojson.decode_message(ConferenceForm, json.dumps(obj))
+                sfs = [protojson.decode_message(SessionForm, json.dumps(sf))
+                    for sf in sessions]
+            except (ValueError, AttributeError, messages.Error) as e:
+                errors.append('line %d: %s' % (lineno, e))
+                continue
+            # same required fields as createConference & createSession
+            if not cf.name:
+                errors.append("line %d: Conference 'name' field required" % lineno)
+            elif not cf.organizerUserId:
+                errors.append("line %d: Conference 'organizerUserId' field required" % lineno)
+            elif not all(sf.name for sf in sfs):
+                errors.append("line %d: The session field 'name' is required" % lineno)
+            elif len(sfs) > SESSION_BATCH_SIZE:
+                # a conference & its sessions are written in one transaction
+                errors.append("line %d: At most %d sessions can be imported per conference"
+                    % (lineno, SESSION_BATCH_SIZE))
+            else:
+                parsed.append((lineno, hashlib.sha1(line.strip()).hexdigest(), cf, sfs))
+
+        # organizer names, fetched together
+        user_ids = sorted(set(cf.organizerUserId for _, _, cf, _ in parsed))
+        profiles = ndb.get_multi([ndb.Key(Profile, user_id) for user_id in user_ids])
+        names = dict((user_id, getattr(prof, 'displayName', None) or user_id)
+            for user_id, prof in zip(user_ids, profiles))
+
+        # build (and so validate) everything before writing anything
+        confs = []
+        for lineno, digest, cf, sfs in parsed:
+            user_id = cf.organizerUserId
+            c_key = ndb.Key(Conference, 'import-%s' % digest,
+                parent=ndb.Key(Profile, user_id))
+            try:
+                conf = ConferenceApi._conferenceFromForm(cf, c_key, names[user_id])
+                sessions = [ConferenceApi._sessionFromForm(sf, None) for sf in sfs]
+            except (ValueError, datastore_errors.BadValueError,
+                    endpoints.BadRequestException) as e:
+                errors.append('line %d: %s' % (lineno, e))
+                continue
+            confs.append((conf, sessions))
+
+        created = 0
+        for conf, sessions in confs:
+            if sessions:
+                first, last = Session.allocate_ids(size=len(sessions), parent=conf.key)
+                for i, session in enumerate(sessions):
+                    session.key = ndb.Key(Session, first + i, parent=conf.key)
+            if ConferenceApi._storeImportedConference(conf, sessions):
+                created += 1
+        if created:
+            ConferenceApi._invalidateQueryCache()
+        return created, errors
+
+
+    @staticmethod
+    @ndb.transactional()
+    def _storeImportedConference(conf, sessions):
+        """Put an imported conference and its sessions, and queue their
+        speaker tasks, unless the conference exists already. Returns True
+        if it was stored."""
+        if conf.key.get():
+            return False
+        conf.put()
+        ndb.get_context().call_on_commit(
+            lambda: ConferenceApi._indexConferences([conf]))
+        if sessions:
+            ConferenceApi._storeSessions(conf.key, sessions)
+            ConferenceApi._queueSessionTasks(conf.key, sessions, transactional=True)
+        return True
+
+
+    @staticmethod
+    def _exportConferences(websafeCursor=None, batchSize=EXPORT_BATCH_SIZE):
+        """Return one batch of conferences with their sessions as JSON lines
+        readable by _importConferences, and the websafe cursor of the next
+        batch (None when done).
+        """
+        cursor = Cursor(urlsafe=websafeCursor) if websafeCursor else None
+        confs, next_cursor, more = Conference.query().fetch_page(
+            batchSize, start_cursor=cursor)
+        # start every session query before waiting on any of them
+        futures = [Session.query(ancestor=conf.key).fetch_async() for conf in confs]
+
+        api = ConferenceApi()
+        lines = []
+        for conf, future in zip(confs, futures):
+            obj = json.loads(protojson.encode_message(api._copyConferenceToForm(conf)))
+            obj['sessions'] = [json.loads(protojson.encode_message(
+                api._copySessionToForm(session))) for session in future.get_result()]
+            lines.append(json.dumps(obj))
+        if more and next_cursor:
+            return lines, next_cursor.urlsafe()
+        return lines, None
+
+
 # - - - Announcements - - - - - - - - - - - - - - - - - - - -
 
     @staticmethod
     def _cacheAnnouncement():
         """Create Announcement & assign to memcache; used by
-        memcache cron job & putAnnouncement().
+        memcache cron job, seat changes & putAnnouncement().
         """
-        confs = Conference.query(ndb.AND(
-            Conference.seatsAvailable <= 5,
-            Conference.seatsAvailable > 0)
-        ).fetch(projection=[Conference.name])
+        # nearly sold out conferences, kept up to date on registration
+        index = ndb.Key(AnnouncementIndex, NEARLY_SOLD_OUT_ID).get()
+        names = sorted((index.conferences or {}).values()) if index else []
 
-        if confs:
+        if names:
             # If there are almost sold out conferences,
             # format announcement and set it in memcache
-            announcement = ANNOUNCEMENT_TPL % (
-                ', '.join(conf.name for conf in confs))
+            announcement = ANNOUNCEMENT_TPL % (', '.join(names))
             memcache.set(MEMCACHE_ANNOUNCEMENTS_KEY, announcement)
         else:
             # If there are no sold out conferences,
@@ -478,9 +1286,68 @@ class ConferenceApi(remote.Service):
         return announcement
 
 
+    @staticmethod
+    def _isNearlySoldOut(seats):
+        """Return True if a conference with this many seats left is
+        announced as nearly sold out."""
+        return 0 < seats <= NEARLY_SOLD_OUT_SEATS
+
+
+    @staticmethod
+    @ndb.transactional()
+    def _setNearlySoldOut(changes):
+        """Apply {websafe key: name or None} to the AnnouncementIndex; a
+        None name removes the conference. Returns True if it changed."""
+        index = AnnouncementIndex.get_or_insert(NEARLY_SOLD_OUT_ID)
+        conferences = dict(index.conferences or {})
+        for wsck, name in changes.items():
+            if name is None:
+                conferences.pop(wsck, None)
+            else:
+                conferences[wsck] = name
+        if conferences == (index.conferences or {}):
+            return False
+        index.conferences = conferences
+        index.put()
+        return True
+
+
+    @staticmethod
+    def _updateNearlySoldOut(conf, seats):
+        """Move conf in or out of the nearly sold out set for its seat count
+        and push the rebuilt announcement to memcache if the set changed."""
+        index = ndb.Key(AnnouncementIndex, NEARLY_SOLD_OUT_ID).get()
+        listed = conf.key.urlsafe() in ((index and index.conferences) or {})
+        if listed == ConferenceApi._isNearlySoldOut(seats):
+            return
+        name = conf.name if ConferenceApi._isNearlySoldOut(seats) else None
+        if ConferenceApi._setNearlySoldOut({conf.key.urlsafe(): name}):
+            ConferenceApi._cacheAnnouncement()
+
+
+    @staticmethod
+    def _reconcileNearlySoldOut():
+        """Recheck the listed conferences and those changed in the last
+        NEARLY_SOLD_OUT_RECHECK_HOURS against Conference.seatsAvailable;
+        used by the memcache cron job to catch anything missed."""
+        since = datetime.now() - timedelta(hours=NEARLY_SOLD_OUT_RECHECK_HOURS)
+        recent = Conference.query(Conference.updated >= since).fetch_async()
+        index = ndb.Key(AnnouncementIndex, NEARLY_SOLD_OUT_ID).get()
+        listed = list((index and index.conferences) or {})
+        confs = ndb.get_multi([ndb.Key(urlsafe=wsck) for wsck in listed])
+
+        # listed conferences that were deleted drop out
+        changes = dict((wsck, None) for wsck, conf in zip(listed, confs) if not conf)
+        for conf in [conf for conf in confs if conf] + recent.get_result():
+            changes[conf.key.urlsafe()] = conf.name \
+                if ConferenceApi._isNearlySoldOut(conf.seatsAvailable or 0) else None
+        ConferenceApi._setNearlySoldOut(changes)
+
+
     @endpoints.method(message_types.VoidMessage, StringMessage,
             path='conference/announcement/get',
             http_method='GET', name='getAnnouncement')
+    @instrumented
     def getAnnouncement(self, request):
         """Return Announcement from memcache."""
         return StringMessage(data=memcache.get(MEMCACHE_ANNOUNCEMENTS_KEY) or "")
@@ -488,10 +1355,8 @@ class ConferenceApi(remote.Service):
 
 # - - - Registration - - - - - - - - - - - - - - - - - - - -
 
-    @ndb.transactional(xg=True)
     def _conferenceRegistration(self, request, reg=True):
         """Register or unregister user for selected conference."""
-        retval = None
         prof = self._getProfileFromUser() # get user Profile
 
         # check if conf exists given websafeConfKey
@@ -502,68 +1367,365 @@ class ConferenceApi(remote.Service):
             raise endpoints.NotFoundException(
                 'No conference found with key: %s' % wsck)
 
-        # register
+        # check if user already registered before looking for a seat
+        if reg and wsck in prof.conferenceKeysToAttend:
+            raise ConflictException(
+                "You have already registered for this conference")
+
+        retval = self._reserveSeat(prof.key, conf, reg, direct=True)
+        # the freed seat goes to the head of the waitlist
+        if retval and not reg:
+            self._schedulePromotion(wsck)
+        return BooleanMessage(data=retval)
+
+
+# - - - Seat shards - - - - - - - - - - - - - - - - - - - -
+
+    @staticmethod
+    def _seatShardKeys(conf_key):
+        """Return the keys of the SeatShards of a conference."""
+        wsck = conf_key.urlsafe()
+        return [ndb.Key(SeatShard, '%s-%d' % (wsck, i)) for i in range(SEAT_SHARDS)]
+
+
+    @staticmethod
+    @ndb.transactional()
+    def _initSeatShardBase(conf_key):
+        """Freeze the seat total that a conference's shards are split from."""
+        conf = conf_key.get()
+        if conf.seatShardBase is None:
+            conf.seatShardBase = conf.seatsAvailable or 0
+            conf.put()
+        return conf
+
+
+    @staticmethod
+    def _rebalanceSeatShards(conf, seats=None, delta=0):
+        """Set the free seats of conf to seats (or change them by delta) and
+        split them over its SeatShards on top of what each has reserved.
+        Runs inside the conference update, which must be cross-group."""
+        keys = ConferenceApi._seatShardKeys(conf.key)
+        shards = ndb.get_multi(keys)
+        created = [shard for shard in shards if shard is not None]
+        if created:
+            free = sum(shard.capacity - shard.reserved for shard in created)
+        else:
+            free = conf.seatsAvailable or 0
+        if seats is None:
+            seats = max(free + delta, 0)
+        conf.seatsAvailable = seats
+
+        if not created:
+            # nothing reserved yet, the shards are split from the base on first use
+            conf.seatShardBase = seats
+        else:
+            for i, key in enumerate(keys):
+                if shards[i] is None:
+                    shards[i] = SeatShard(key=key, conference=conf.key, reserved=0)
+                shards[i].capacity = shards[i].reserved + seats // SEAT_SHARDS + \
+                    (1 if i < seats % SEAT_SHARDS else 0)
+            conf.seatShardBase = sum(shard.capacity for shard in shards)
+            ndb.put_multi(shards)
+
+        ndb.get_context().call_on_commit(
+            lambda: ConferenceApi._updateNearlySoldOut(conf, seats))
+        if seats > free:
+            # new seats go to the waitlist first
+            ndb.get_context().call_on_commit(
+                lambda: ConferenceApi._schedulePromotion(conf.key.urlsafe()))
+
+
+    @staticmethod
+    def _getSeatShards(conf):
+        """Return the SeatShards of a conference, creating them on first
+        use, and the number of profiles on its waitlist."""
+        keys = ConferenceApi._seatShardKeys(conf.key)
+        entities = ndb.get_multi(keys + [ndb.Key(WaitlistCount, conf.key.urlsafe())])
+        shards, counter = entities[:-1], entities[-1]
+        if None in shards:
+            # conferences created before sharding have no base yet
+            if conf.seatShardBase is None:
+                conf = ConferenceApi._initSeatShardBase(conf.key)
+            base = conf.seatShardBase
+            futures = {}
+            for i, shard in enumerate(shards):
+                if shard is None:
+                    capacity = base // SEAT_SHARDS + (1 if i < base % SEAT_SHARDS else 0)
+                    futures[i] = SeatShard.get_or_insert_async(keys[i].id(),
+                        conference=conf.key, capacity=capacity, reserved=0)
+            for i, future in futures.items():
+                shards[i] = future.get_result()
+        return shards, counter.count if counter else 0
+
+
+    @staticmethod
+    @ndb.transactional(xg=True)
+    def _reserveSeatInShard(p_key, shard_key, wsck, reg):
+        """Move one seat between a SeatShard and a Profile.
+
+        The Profile's Registration, in the Profile's entity group, is
+        written or deleted in the same transaction, and a registration
+        takes the Profile off the conference's waitlist. Returns the
+        committed SeatShard when the seat moved, False when unregistering a
+        profile that was not registered and None when the shard is full.
+        """
+        w_key = ndb.Key(WaitlistEntry, wsck, parent=p_key)
+        prof, shard, entry = ndb.get_multi([p_key, shard_key, w_key])
+        r_key = ndb.Key(Registration, wsck, parent=p_key)
         if reg:
-            # check if user already registered otherwise add
             if wsck in prof.conferenceKeysToAttend:
                 raise ConflictException(
                     "You have already registered for this conference")
+            if shard.reserved >= shard.capacity:
+                return None
+            prof.conferenceKeysToAttend.append(wsck)
+            shard.reserved += 1
+            ndb.put_multi([prof, shard,
+                Registration(key=r_key, conference=ndb.Key(urlsafe=wsck))])
+            if entry:
+                w_key.delete()
+                ConferenceApi._changeWaitlistCount(wsck, -1)
+        else:
+            if wsck not in prof.conferenceKeysToAttend:
+                return False
+            # a seat given back may land on any shard, capacity is per shard
+            prof.conferenceKeysToAttend.remove(wsck)
+            shard.reserved -= 1
+            ndb.put_multi([prof, shard])
+            r_key.delete()
+        ndb.get_context().call_on_commit(
+            lambda: ConferenceApi._invalidateAttending([p_key.id()]))
+        return shard
+
 
-            # check if seats avail
-            if conf.seatsAvailable <= 0:
+    @staticmethod
+    def _reserveSeat(p_key, conf, reg=True, direct=False):
+        """Register (or unregister) the profile at p_key for conf.
+
+        Each attempt is a cross-group transaction over the Profile and one
+        randomly chosen SeatShard, so registrants only contend when they
+        land on the same shard and a shard never hands out more seats than
+        its capacity. A direct registration is refused while others wait
+        for the conference; only the head of the waitlist may register.
+        """
+        wsck = conf.key.urlsafe()
+        shards, waiting = ConferenceApi._getSeatShards(conf)
+        # freed seats belong to the waitlist until the promote task ran
+        if reg and direct and waiting:
+            head = ConferenceApi._waitlistHead(conf.key)
+            if head and head.parent() != p_key:
                 raise ConflictException(
-                    "There are no seats available.")
+                    "Profiles are waiting for this conference; join the waitlist instead.")
+        if reg:
+            candidates = [s.key for s in shards if s.reserved < s.capacity]
+        else:
+            candidates = [s.key for s in shards]
+        random.shuffle(candidates)
+
+        for shard_key in candidates:
+            committed = ConferenceApi._reserveSeatInShard(p_key, shard_key, wsck, reg)
+            if committed is None:
+                # shard filled up since we looked at it; try the next one
+                continue
+            if not committed:
+                return False
+            ConferenceApi._scheduleSeatReconcile(wsck)
+            # seats left with this shard as committed and the others as read
+            # before; near the threshold the announcement is updated right
+            # away (a no-op if it is listed correctly) and reconcile fixes
+            # the estimate
+            after = sum(committed.capacity - committed.reserved if shard.key == shard_key
+                else shard.capacity - shard.reserved for shard in shards)
+            before = after + 1 if reg else after - 1
+            if ConferenceApi._isNearlySoldOut(before) or \
+                    ConferenceApi._isNearlySoldOut(after):
+                ConferenceApi._updateNearlySoldOut(conf, after)
+            return True
+
+        raise ConflictException(
+            "There are no seats available.")
 
-            # register user, take away one seat
-            prof.conferenceKeysToAttend.append(wsck)
-            conf.seatsAvailable -= 1
-            retval = True
 
-        # unregister
-        else:
-            # check if user already registered
-            if wsck in prof.conferenceKeysToAttend:
+    @staticmethod
+    def _scheduleWindowedTask(prefix, url, websafeConferenceKey, delay):
+        """Queue a conference task at url at most once per delay seconds.
+
+        Tasks are named by prefix, conference and window, so a burst of
+        calls produces one task per window, run at its end.
+        """
+        window = int(time.time()) // delay
+        try:
+            taskqueue.add(
+                name='%s-%s-%d' % (prefix, websafeConferenceKey, window),
+                params={'websafeConferenceKey': websafeConferenceKey},
+                url=url,
+                countdown=delay,
+            )
+        except (taskqueue.TaskAlreadyExistsError, taskqueue.TombstonedTaskError):
+            pass
+
+
+    @staticmethod
+    def _scheduleSeatReconcile(websafeConferenceKey):
+        """Queue a task folding the shards back into seatsAvailable, one
+        per conference and SEAT_RECONCILE_DELAY window."""
+        ConferenceApi._scheduleWindowedTask('reconcile-seats',
+            '/tasks/reconcile_seats', websafeConferenceKey, SEAT_RECONCILE_DELAY)
+
 
-                # unregister user, add back one seat
-                prof.conferenceKeysToAttend.remove(wsck)
-                conf.seatsAvailable += 1
-                retval = True
+    @staticmethod
+    @ndb.transactional()
+    def _setSeatsAvailable(conf_key, seats):
+        """Store the reconciled seat count on the Conference."""
+        conf = conf_key.get()
+        if conf and conf.seatsAvailable != seats:
+            conf.seatsAvailable = seats
+            conf.put()
+            ndb.get_context().call_on_commit(
+                lambda: ConferenceApi._invalidateConferenceCache([conf_key.urlsafe()]))
+        return conf
+
+
+    @staticmethod
+    def _reconcileSeats(websafeConferenceKey):
+        """Recompute seatsAvailable from the SeatShards; used by task queue."""
+        conf_key = ndb.Key(urlsafe=websafeConferenceKey)
+        shards = ndb.get_multi(ConferenceApi._seatShardKeys(conf_key))
+        if None in shards:
+            return None
+        seats = sum(shard.capacity - shard.reserved for shard in shards)
+        conf = ConferenceApi._setSeatsAvailable(conf_key, seats)
+        # exact count; corrects estimates made during registration
+        if conf:
+            ConferenceApi._updateNearlySoldOut(conf, seats)
+        return seats
+
+
+    @ndb.tasklet
+    def _fetchAttendingAsync(self, websafeConferenceKeys):
+        """Get conferences by websafe key, each with its organizer's name
+        if the conference has none stored yet. Every conference starts its
+        organizer get as soon as it arrives, one get per organizer, and ndb
+        batches the gets issued together. Returns ConferenceForms and the
+        keys of conferences that do not exist (anymore)."""
+        organisers = {}
+
+        @ndb.tasklet
+        def fetchOne(wsck):
+            try:
+                c_key = ndb.Key(urlsafe=wsck)
+            except (ProtocolBufferDecodeError, TypeError):
+                raise ndb.Return(None, None)
+            if c_key.kind() != 'Conference':
+                raise ndb.Return(None, None)
+            conf = yield c_key.get_async()
+            name = None
+            if conf and conf.organizerDisplayName is None:
+                if conf.organizerUserId not in organisers:
+                    organisers[conf.organizerUserId] = \
+                        ndb.Key(Profile, conf.organizerUserId).get_async()
+                prof = yield organisers[conf.organizerUserId]
+                name = getattr(prof, 'displayName', None)
+            raise ndb.Return(conf, name)
+
+        # registered keys are unique, but don't rely on it
+        wscks = []
+        for wsck in websafeConferenceKeys:
+            if wsck not in wscks:
+                wscks.append(wsck)
+        results = yield [fetchOne(wsck) for wsck in wscks]
+
+        forms = ConferenceForms()
+        stale = []
+        for wsck, (conf, name) in zip(wscks, results):
+            if conf:
+                forms.items.append(self._copyConferenceToForm(conf, name))
             else:
-                retval = False
+                stale.append(wsck)
+        raise ndb.Return(forms, stale)
 
-        # write things back to the datastore & return
-        prof.put()
-        conf.put()
-        return BooleanMessage(data=retval)
+
+    @staticmethod
+    @ndb.transactional()
+    def _pruneConferenceKeys(p_key, stale):
+        """Drop keys of conferences that no longer exist from a Profile."""
+        prof = p_key.get()
+        keep = [wsck for wsck in prof.conferenceKeysToAttend if wsck not in stale]
+        if len(keep) != len(prof.conferenceKeysToAttend):
+            prof.conferenceKeysToAttend = keep
+            prof.put()
+            ndb.get_context().call_on_commit(
+                lambda: ConferenceApi._invalidateAttending([p_key.id()]))
+
+
+    @staticmethod
+    def _invalidateAttending(user_ids):
+        """Drop the cached attending lists of users whose registrations
+        changed, blocking re-adds for ATTENDING_LOCK_SECONDS."""
+        memcache.delete_multi(user_ids, seconds=ATTENDING_LOCK_SECONDS,
+            key_prefix=MEMCACHE_ATTENDING_PREFIX)
+
+
+    def _getAttending(self):
+        """Return ConferenceForms of the conferences the current user is
+        registered for, read through a per-user memcache entry.
+
+        Registering & unregistering drop the entry; other conference
+        changes show up within ATTENDING_CACHE_TTL.
+        """
+        ctx = ProfileContext()
+        cache_key = MEMCACHE_ATTENDING_PREFIX + ctx.key.id()
+        cached = memcache.get(cache_key)
+        if cached is not None:
+            return protojson.decode_message(ConferenceForms, cached)
+
+        prof = ctx.profile
+        ctx.flush()
+        forms, stale = self._fetchAttendingAsync(
+            prof.conferenceKeysToAttend).get_result()
+        if stale:
+            # deleted conferences; lazily removed from the profile
+            self._pruneConferenceKeys(prof.key, stale)
+        else:
+            # add, not set: fails while an invalidation is recent
+            memcache.add(cache_key, protojson.encode_message(forms),
+                time=ATTENDING_CACHE_TTL)
+        return forms
 
 
     @endpoints.method(message_types.VoidMessage, ConferenceForms,
             path='conferences/attending',
             http_method='GET', name='getConferencesToAttend')
+    @instrumented
     def getConferencesToAttend(self, request):
         """Get list of conferences that user has registered for."""
-        prof = self._getProfileFromUser() # get user Profile
-        conf_keys = [ndb.Key(urlsafe=wsck) for wsck in prof.conferenceKeysToAttend]
-        conferences = ndb.get_multi(conf_keys)
-
-        # get organizers
-        organisers = [ndb.Key(Profile, conf.organizerUserId) for conf in conferences]
-        profiles = ndb.get_multi(organisers)
-
-        # put display names in a dict for easier fetching
-        names = {}
-        for profile in profiles:
-            names[profile.key.id()] = profile.displayName
-
-        # return set of ConferenceForm objects per Conference
-        return ConferenceForms(items=[self._copyConferenceToForm(conf, names[conf.organizerUserId])\
-         for conf in conferences]
+        return self._getAttending()
+
+
+    @endpoints.method(message_types.VoidMessage, ConferenceSummaryForms,
+            path='conferences/attending/summary',
+            http_method='GET', name='getConferenceSummariesToAttend')
+    @instrumented
+    def getConferenceSummariesToAttend(self, request):
+        """Get list view summaries of conferences that user has registered for."""
+        # from the same cached list as getConferencesToAttend
+        return ConferenceSummaryForms(
+            items=[ConferenceSummaryForm(
+                name=cf.name,
+                city=cf.city,
+                startDate=cf.startDate,
+                endDate=cf.endDate,
+                maxAttendees=cf.maxAttendees,
+                seatsAvailable=cf.seatsAvailable,
+                websafeKey=cf.websafeKey,
+            ) for cf in self._getAttending().items]
         )
 
 
     @endpoints.method(CONF_GET_REQUEST, BooleanMessage,
             path='conference/{websafeConferenceKey}',
             http_method='POST', name='registerForConference')
+    @instrumented
     def registerForConference(self, request):
         """Register user for selected conference."""
         return self._conferenceRegistration(request)
@@ -572,6 +1734,7 @@ class ConferenceApi(remote.Service):
     @endpoints.method(CONF_GET_REQUEST, BooleanMessage,
             path='conference/{websafeConferenceKey}',
             http_method='DELETE', name='unregisterFromConference')
+    @instrumented
     def unregisterFromConference(self, request):
         """Unregister user for selected conference."""
         return self._conferenceRegistration(request, reg=False)
@@ -580,6 +1743,7 @@ class ConferenceApi(remote.Service):
     @endpoints.method(message_types.VoidMessage, ConferenceForms,
             path='filterPlayground',
             http_method='GET', name='filterPlayground')
+    @instrumented
     def filterPlayground(self, request):
         """Filter Playground"""
         q = Conference.query()
@@ -596,6 +1760,389 @@ class ConferenceApi(remote.Service):
             items=[self._copyConferenceToForm(conf, "") for conf in q]
         )
 
+# - - - Group bookings - - - - - - - - - - - - - - - - - - -
+
+    @staticmethod
+    @ndb.transactional(xg=True)
+    def _reserveGroupSeats(shard_keys, wsck, attendees, bookingId):
+        """Take len(attendees) seats from a conference's SeatShards in one
+        cross-group transaction, or none if there are not enough, and queue
+        the task registering the attendees. Returns the seats left before
+        the booking, or None if the group did not fit.
+        """
+        shards = ndb.get_multi(shard_keys)
+        free = sum(max(shard.capacity - shard.reserved, 0) for shard in shards)
+        if free < len(attendees):
+            return None
+        remaining = len(attendees)
+        changed = []
+        # emptiest shards first, so the booking touches as few as possible
+        for shard in sorted(shards, key=lambda s: s.reserved - s.capacity):
+            if not remaining:
+                break
+            take = min(remaining, shard.capacity - shard.reserved)
+            if take > 0:
+                shard.reserved += take
+                remaining -= take
+                changed.append(shard)
+        ndb.put_multi(changed)
+        taskqueue.add(params={'websafeConferenceKey': wsck,
+            'attendee': attendees, 'bookingId': bookingId},
+            url='/tasks/apply_group_booking', transactional=True)
+        return free
+
+
+    @endpoints.method(GROUP_BOOKING_REQUEST, GroupBookingResultForm,
+            path='conference/{websafeConferenceKey}/group',
+            http_method='POST', name='registerGroupForConference')
+    @instrumented
+    def registerGroupForConference(self, request):
+        """Register a group of attendees, given by the user ids (emails) of
+        their profiles, for a conference; organizer only. All seats are
+        reserved together or none are. The attendees' profiles are updated
+        by a follow-up task."""
+        wsck = request.websafeConferenceKey
+        conf = self._getOwnedConference(wsck)
+        attendees = sorted(set(a.strip() for a in request.attendees if a.strip()))
+        if not attendees:
+            raise endpoints.BadRequestException("'attendees' must not be empty.")
+        if len(attendees) > MAX_GROUP_SIZE:
+            raise endpoints.BadRequestException(
+                "At most %d attendees can be booked at once." % MAX_GROUP_SIZE)
+
+        # no seats for attendees who are registered already
+        profiles = ndb.get_multi([ndb.Key(Profile, a) for a in attendees])
+        unknown = [a for a, prof in zip(attendees, profiles) if prof is None]
+        if unknown:
+            raise endpoints.BadRequestException(
+                "No profile found for attendees: %s" % ', '.join(unknown))
+        registered = [a for a, prof in zip(attendees, profiles)
+            if prof and wsck in prof.conferenceKeysToAttend]
+        booked = [a for a in attendees if a not in registered]
+        if booked:
+            shards, waiting = self._getSeatShards(conf)
+            if waiting:
+                raise ConflictException(
+                    "Profiles are waiting for this conference; seats go to the waitlist first.")
+            free = self._reserveGroupSeats([shard.key for shard in shards],
+                wsck, booked, uuid.uuid4().hex)
+            if free is None:
+                raise ConflictException(
+                    "There are not enough seats available for %d attendees." % len(booked))
+            self._scheduleSeatReconcile(wsck)
+            after = free - len(booked)
+            if self._isNearlySoldOut(free) != self._isNearlySoldOut(after):
+                self._updateNearlySoldOut(conf, after)
+        return GroupBookingResultForm(booked=booked, alreadyRegistered=registered)
+
+
+    @staticmethod
+    @ndb.transactional(xg=True)
+    def _registerGroupProfiles(p_keys, wsck, bookingId, shard_key):
+        """Register a batch of a group booking's profiles with a single
+        put_multi. A seat reserved for a profile that registered or was
+        deleted meanwhile goes back to shard_key and is recorded on the
+        GroupBooking. Profiles registered by this booking, or whose seat it
+        gave back, are skipped, so replaying is harmless. Returns the number
+        of the batch's seats given back, on this run or an earlier one.
+        """
+        c_key = ndb.Key(urlsafe=wsck)
+        b_key = ndb.Key(GroupBooking, bookingId)
+        r_keys = [ndb.Key(Registration, wsck, parent=p_key) for p_key in p_keys]
+        w_keys = [ndb.Key(WaitlistEntry, wsck, parent=p_key) for p_key in p_keys]
+        n = len(p_keys)
+        entities = ndb.get_multi([b_key] + list(p_keys) + r_keys + w_keys)
+        booking = entities[0] or GroupBooking(key=b_key)
+        profiles = entities[1:n + 1]
+        registrations, entries = entities[n + 1:2 * n + 1], entities[2 * n + 1:]
+
+        puts = []
+        recorded = len(booking.released)
+        released = [p_key.id() for p_key in p_keys if p_key.id() in booking.released]
+        for p_key, r_key, prof, reg in zip(p_keys, r_keys, profiles, registrations):
+            if (reg and reg.bookingId == bookingId) or p_key.id() in released:
+                continue
+            if prof is None or wsck in prof.conferenceKeysToAttend:
+                booking.released.append(p_key.id())
+                continue
+            prof.conferenceKeysToAttend.append(wsck)
+            puts.append(prof)
+            puts.append(Registration(key=r_key, conference=c_key, bookingId=bookingId))
+        newly = len(booking.released) - recorded
+        if newly:
+            shard = shard_key.get()
+            shard.reserved -= newly
+            puts.extend([shard, booking])
+        ndb.put_multi(puts)
+        waited = [entry.key for entry in entries if entry]
+        if waited:
+            ndb.delete_multi(waited)
+            ConferenceApi._changeWaitlistCount(wsck, -len(waited))
+        ndb.get_context().call_on_commit(lambda: ConferenceApi._invalidateAttending(
+            [p_key.id() for p_key in p_keys]))
+        return len(released) + newly
+
+
+    @staticmethod
+    def _applyGroupBooking(websafeConferenceKey, attendees, bookingId):
+        """Register the attendees of a group booking whose seats are
+        reserved; used by the apply group booking task."""
+        p_keys = [ndb.Key(Profile, a) for a in attendees]
+        shard_keys = ConferenceApi._seatShardKeys(ndb.Key(urlsafe=websafeConferenceKey))
+        released = 0
+        for i in range(0, len(p_keys), GROUP_PROFILE_BATCH_SIZE):
+            released += ConferenceApi._registerGroupProfiles(
+                p_keys[i:i + GROUP_PROFILE_BATCH_SIZE], websafeConferenceKey,
+                bookingId, random.choice(shard_keys))
+        if released:
+            ConferenceApi._scheduleSeatReconcile(websafeConferenceKey)
+            ConferenceApi._schedulePromotion(websafeConferenceKey)
+
+
+# - - - Waitlist - - - - - - - - - - - - - - - - - - - - - -
+
+    def _waitlistPosition(self, entry):
+        """Return the 1-based place of a WaitlistEntry in its conference's
+        FIFO waitlist."""
+        ahead = WaitlistEntry.query(
+            WaitlistEntry.conference == entry.conference,
+            WaitlistEntry.joinedAt < entry.joinedAt).count()
+        return ahead + 1
+
+
+    @staticmethod
+    def _changeWaitlistCount(websafeConferenceKey, delta):
+        """Add delta to a conference's WaitlistCount; called in the
+        transaction adding or deleting its WaitlistEntries."""
+        counter = ndb.Key(WaitlistCount, websafeConferenceKey).get() or \
+            WaitlistCount(id=websafeConferenceKey)
+        counter.count = max(counter.count + delta, 0)
+        counter.put()
+
+
+    @staticmethod
+    @ndb.transactional(xg=True)
+    def _joinWaitlist(p_key, c_key):
+        """Put a profile's WaitlistEntry for a conference unless it exists;
+        returns the entry."""
+        wsck = c_key.urlsafe()
+        w_key = ndb.Key(WaitlistEntry, wsck, parent=p_key)
+        entry = w_key.get()
+        if not entry:
+            entry = WaitlistEntry(key=w_key, conference=c_key)
+            entry.put()
+            ConferenceApi._changeWaitlistCount(wsck, 1)
+        return entry
+
+
+    @staticmethod
+    @ndb.transactional(xg=True)
+    def _leaveWaitlist(w_key):
+        """Delete a WaitlistEntry; returns False if there was none."""
+        if not w_key.get():
+            return False
+        w_key.delete()
+        ConferenceApi._changeWaitlistCount(w_key.id(), -1)
+        return True
+
+
+    @staticmethod
+    def _waitlistHead(conf_key):
+        """Return the key of the longest waiting WaitlistEntry of a
+        conference, or None if nobody waits."""
+        return WaitlistEntry.query(WaitlistEntry.conference == conf_key).order(
+            WaitlistEntry.joinedAt).get(keys_only=True)
+
+
+    @endpoints.method(CONF_GET_REQUEST, WaitlistPositionForm,
+            path='conference/{websafeConferenceKey}/waitlist',
+            http_method='POST', name='joinWaitlist')
+    @instrumented
+    def joinWaitlist(self, request):
+        """Wait for a seat at a sold out conference; seats freed by
+        unregistering go to the waitlist in the order it was joined."""
+        prof = self._getProfileFromUser()
+        wsck = request.websafeConferenceKey
+        c_key = self._conferenceKey(wsck)
+        conf = c_key.get()
+        if not conf:
+            raise endpoints.NotFoundException(
+                'No conference found with key: %s' % wsck)
+        if wsck in prof.conferenceKeysToAttend:
+            raise ConflictException(
+                "You have already registered for this conference")
+        counter = ndb.Key(WaitlistCount, wsck).get()
+        if conf.seatsAvailable > 0 and not (counter and counter.count):
+            raise ConflictException(
+                "There are seats available; register for the conference instead.")
+
+        entry = self._joinWaitlist(prof.key, c_key)
+        # a seat may have been freed just before the entry existed
+        self._schedulePromotion(wsck)
+        return WaitlistPositionForm(waiting=True,
+            position=self._waitlistPosition(entry))
+
+
+    @endpoints.method(CONF_GET_REQUEST, BooleanMessage,
+            path='conference/{websafeConferenceKey}/waitlist',
+            http_method='DELETE', name='leaveWaitlist')
+    @instrumented
+    def leaveWaitlist(self, request):
+        """Leave a conference's waitlist."""
+        ctx = ProfileContext()
+        w_key = ndb.Key(WaitlistEntry, request.websafeConferenceKey, parent=ctx.key)
+        return BooleanMessage(data=self._leaveWaitlist(w_key))
+
+
+    @endpoints.method(CONF_GET_REQUEST, WaitlistPositionForm,
+            path='conference/{websafeConferenceKey}/waitlist',
+            http_method='GET', name='getWaitlistPosition')
+    @instrumented
+    def getWaitlistPosition(self, request):
+        """Get the current user's place in a conference's waitlist."""
+        ctx = ProfileContext()
+        entry = ndb.Key(WaitlistEntry, request.websafeConferenceKey,
+            parent=ctx.key).get()
+        if not entry:
+            return WaitlistPositionForm(waiting=False)
+        return WaitlistPositionForm(waiting=True,
+            position=self._waitlistPosition(entry))
+
+
+    @staticmethod
+    def _schedulePromotion(websafeConferenceKey):
+        """Queue a task giving freed seats to the waitlist, one per
+        conference and WAITLIST_PROMOTE_DELAY window."""
+        ConferenceApi._scheduleWindowedTask('promote-waitlist',
+            '/tasks/promote_waitlist', websafeConferenceKey, WAITLIST_PROMOTE_DELAY)
+
+
+    @staticmethod
+    def _promoteWaitlist(websafeConferenceKey):
+        """Register the longest waiting profiles while seats last, up to
+        WAITLIST_PROMOTE_BATCH_SIZE of them; used by the promote task.
+        Returns True if seats are left and more profiles are waiting.
+        """
+        conf = ndb.Key(urlsafe=websafeConferenceKey).get()
+        if not conf:
+            return False
+        entries = WaitlistEntry.query(
+            WaitlistEntry.conference == conf.key).order(
+            WaitlistEntry.joinedAt).fetch(WAITLIST_PROMOTE_BATCH_SIZE + 1)
+        for entry in entries[:WAITLIST_PROMOTE_BATCH_SIZE]:
+            p_key = entry.key.parent()
+            try:
+                # also takes the entry off the waitlist
+                ConferenceApi._reserveSeat(p_key, conf)
+            except ConflictException:
+                prof = p_key.get()
+                if prof and websafeConferenceKey in prof.conferenceKeysToAttend:
+                    # registered by other means meanwhile
+                    ConferenceApi._leaveWaitlist(entry.key)
+                    continue
+                # sold out again
+                return False
+        return len(entries) > WAITLIST_PROMOTE_BATCH_SIZE
+
+
+# - - - Roster - - - - - - - - - - - - - - - - - - - - - - -
+
+    @endpoints.method(ROSTER_GET_REQUEST, AttendeeForms,
+            path='conference/{websafeConferenceKey}/roster',
+            http_method='GET', name='getConferenceRoster')
+    @instrumented
+    def getConferenceRoster(self, request):
+        """List a conference's attendees in registration order, a page at a
+        time; only the organizer may see it."""
+        conf = self._getOwnedConference(request.websafeConferenceKey)
+        page_size = min(request.pageSize or MAX_PAGE_SIZE, MAX_PAGE_SIZE)
+        if page_size <= 0:
+            raise endpoints.BadRequestException("'pageSize' must be positive.")
+        try:
+            cursor = Cursor(urlsafe=request.pageToken) if request.pageToken else None
+            r_keys, next_cursor, more = Registration.query(
+                Registration.conference == conf.key).order(
+                Registration.registeredAt).fetch_page(
+                page_size, start_cursor=cursor, keys_only=True)
+        except (datastore_errors.BadValueError, datastore_errors.BadRequestError):
+            raise endpoints.BadRequestException("Invalid 'pageToken'.")
+
+        # registrations & their attendees' profiles in one batch
+        entities = ndb.get_multi(r_keys + [r_key.parent() for r_key in r_keys])
+        registrations, profiles = entities[:len(r_keys)], entities[len(r_keys):]
+        items = []
+        for reg, prof in zip(registrations, profiles):
+            if not reg or not prof:
+                continue
+            items.append(AttendeeForm(
+                displayName=prof.displayName,
+                mainEmail=prof.mainEmail,
+                teeShirtSize=prof.teeShirtSize,
+                registeredAt=str(reg.registeredAt) if reg.registeredAt else None,
+            ))
+        return AttendeeForms(
+            items=items,
+            nextPageToken=next_cursor.urlsafe() if more and next_cursor else None
+        )
+
+
+    @endpoints.method(CONF_GET_REQUEST, AttendanceForm,
+            path='conference/{websafeConferenceKey}/attendance',
+            http_method='GET', name='getConferenceAttendance')
+    @instrumented
+    def getConferenceAttendance(self, request):
+        """Count a conference's attendees; seatsAvailable is summed from the
+        seat shards, so it is exact rather than the reconciled estimate."""
+        c_key = self._conferenceKey(request.websafeConferenceKey)
+        conf = c_key.get_async()
+        attendees = Registration.query(
+            Registration.conference == c_key).count_async()
+        shards = ndb.get_multi_async(self._seatShardKeys(c_key))
+        conf = conf.get_result()
+        if not conf:
+            raise endpoints.NotFoundException(
+                'No conference found with key: %s' % request.websafeConferenceKey)
+        shards = [shard.get_result() for shard in shards]
+        if None in shards:
+            seats = conf.seatsAvailable
+        else:
+            seats = sum(shard.capacity - shard.reserved for shard in shards)
+        return AttendanceForm(
+            attendees=attendees.get_result(),
+            maxAttendees=conf.maxAttendees,
+            seatsAvailable=seats,
+        )
+
+
+    @staticmethod
+    @ndb.transactional()
+    def _backfillProfileRegistrations(p_key):
+        """Create the missing Registrations of one Profile."""
+        prof = p_key.get()
+        if not prof:
+            return
+        r_keys = [ndb.Key(Registration, wsck, parent=p_key)
+            for wsck in prof.conferenceKeysToAttend]
+        missing = [Registration(key=r_key, conference=ndb.Key(urlsafe=r_key.id()))
+            for r_key, reg in zip(r_keys, ndb.get_multi(r_keys)) if reg is None]
+        if missing:
+            ndb.put_multi(missing)
+
+
+    @staticmethod
+    def _backfillRegistrations(websafeCursor=None):
+        """Create Registrations for one batch of profiles registered before
+        they existed; returns the websafe cursor of the next batch, or None
+        when done. registeredAt is the backfill time for these."""
+        cursor = Cursor(urlsafe=websafeCursor) if websafeCursor else None
+        profiles, next_cursor, more = Profile.query().fetch_page(
+            REGISTRATION_BACKFILL_BATCH_SIZE, start_cursor=cursor)
+        for prof in profiles:
+            if prof.conferenceKeysToAttend:
+                ConferenceApi._backfillProfileRegistrations(prof.key)
+        return next_cursor.urlsafe() if more and next_cursor else None
+
+
 # - - - Sessions - - - - - - - - - - - - - - - - - - - -
 #created using the following sources:
 # large sections of the Conference objects 
@@ -609,33 +2156,46 @@ class ConferenceApi(remote.Service):
 #   - https://discussions.udacity.com/t/createsession-sessionform-websafeconferencekey-endpoint/29851
     def _createSessionObject(self, request):
         """Create Session Object, w/ createSession method returns the request ."""
+        #if the name field has not been filled 
+        if not request.name:
+            raise endpoints.BadRequestException("The session field 'name' is required")
+        #if the websafe conference field has not been filled
+        if not request.websafeConferenceKey:
+            raise endpoints.BadRequestException("The session field 'websafeConferenceKey' is required")
+        #only the creator of the conference can add sessions to it
+        conf = self._getOwnedConference(request.websafeConferenceKey)
+        #return self._copySessionToForm(request)
+        return self._copySessionToForm(self._createSessions(conf.key, [request])[0])
+
+    def _getOwnedConference(self, websafeConferenceKey):
+        """Return the conference, making sure the current user created it."""
         #get the current user logged in
         user = endpoints.get_current_user()
         #if there is not a user logged in currently
         if not user:
-        	#advise auth is requried to proceed
+            #advise auth is requried to proceed
             raise endpoints.UnauthorizedException('User Authorization required')
         #-----user exists--------
         #get user id from user object
         user_id = getUserId(user)
-        #if the name field has not been filled 
-        if not request.name:
-            raise endpoints.BadRequestException("The session field 'name' is required")
-        #if the websafe conference field has not been filled
-        if not request.websafeConferenceKey:
-            raise endpoints.BadRequestException("The session field 'websafeConferenceKey' is required")
         #get the conference assosiated with the provided websafeconferencekey
-        conf = ndb.Key(urlsafe=request.websafeConferenceKey).get()
+        conf = ndb.Key(urlsafe=websafeConferenceKey).get()
         #if the conference is not found given the provided websafeconferencekey 
         if not conf:
             raise endpoints.NotFoundException(
-                "A conference could not be found with the conference key: %s" % request.websafeConferenceKey)
+                "A conference could not be found with the conference key: %s" % websafeConferenceKey)
         #if the user who is logged in is not the origional creater of the conference
         if user_id != conf.organizerUserId:
             raise endpoints.ForbiddenException(
                 "The maker of the conference is the only one that can update it.")
-        #get the field data from the request
-        data = {field.name: getattr(request, field.name) for field in request.all_fields()}
+        return conf
+
+    @staticmethod
+    def _sessionFromForm(form, s_key):
+        """Build a Session entity (not yet stored) from a SessionForm;
+        raises BadRequestException for a malformed field."""
+        #get the field data from the form
+        data = {field.name: getattr(form, field.name) for field in form.all_fields()}
         del data['websafeKey']
         del data['websafeConferenceKey']
         del data['conferenceName']
@@ -643,104 +2203,254 @@ class ConferenceApi(remote.Service):
         for df in SESSION_DEFAULTS:
             if data[df] in (None, []):
                 data[df] = SESSION_DEFAULTS[df]
-                setattr(request, df, SESSION_DEFAULTS[df])
+                setattr(form, df, SESSION_DEFAULTS[df])
+        #the speaker names the session's SpeakerSessions entity
+        if not data['speaker'].strip():
+            raise endpoints.BadRequestException("The session field 'speaker' must not be blank")
         #if the session has a date format it.
         if data['date']:
-            data['date'] = datetime.strptime(data['date'][:10], "%Y-%m-%d").date()
+            try:
+                data['date'] = datetime.strptime(data['date'][:10], "%Y-%m-%d").date()
+            except ValueError:
+                raise endpoints.BadRequestException("'date' must be written as YYYY-MM-DD.")
         #if the session has a start time format it. 
         if data['startTime']:
-            data['startTime'] = datetime.strptime(data['startTime'][:5], "%H:%M").time()
+            try:
+                data['startTime'] = datetime.strptime(data['startTime'][:5], "%H:%M").time()
+            except ValueError:
+                raise endpoints.BadRequestException("'startTime' must be written as HH:MM.")
 
-        c_key = ndb.Key(urlsafe=request.websafeConferenceKey)
-        s_id = Session.allocate_ids(size=1, parent=c_key)[0]
-        s_key = ndb.Key(Session, s_id, parent=c_key)
         data['key'] = s_key
+        return Session(**data)
 
-        Session(**data).put()
-        #get the number of speakers 
-        #sessions = Session.query(Session.speaker == data['speaker']).count()
-        #if there is more than one speaker set the featured
-        
-        #if sessions > 1:
-        taskqueue.add(params={'speaker': data['speaker'], 'websafeConferencekey': c_key}, url='/tasks/set_featured_speaker')
+    @staticmethod
+    def _createSessions(c_key, forms):
+        """Create sessions of one conference from SessionForms.
 
-        #return self._copySessionToForm(request)
-        return self._copySessionToForm(s_key.get())
+        Every form is checked before anything is written. Ids come from a
+        single allocated range, sessions are written in
+        SESSION_BATCH_SIZE transactions and one task checks the featured
+        speaker for all of them. Returns the stored Session entities.
+        """
+        sessions = [ConferenceApi._sessionFromForm(form, None) for form in forms]
+        first, last = Session.allocate_ids(size=len(forms), parent=c_key)
+        for i, session in enumerate(sessions):
+            session.key = ndb.Key(Session, first + i, parent=c_key)
+        #write the sessions and bump their speakers' counts in the conference
+        for i in range(0, len(sessions), SESSION_BATCH_SIZE):
+            ConferenceApi._storeSessions(c_key, sessions[i:i + SESSION_BATCH_SIZE])
+        ConferenceApi._queueSessionTasks(c_key, sessions)
+        return sessions
+
+    @staticmethod
+    def _queueSessionTasks(c_key, sessions, transactional=False):
+        """Check whether any of the speakers of new sessions is now featured
+        & add the sessions to the speaker directory, both tasks in one add."""
+        taskqueue.Queue().add([
+            taskqueue.Task(params={
+                'speaker': sorted(set(session.speaker for session in sessions)),
+                'websafeConferenceKey': c_key.urlsafe()},
+                url='/tasks/set_featured_speaker'),
+            taskqueue.Task(params={
+                'add': [session.key.urlsafe() for session in sessions]},
+                url='/tasks/update_speakers'),
+        ], transactional=transactional)
+
+    @staticmethod
+    @ndb.transactional()
+    def _storeSessions(c_key, sessions):
+        """Put sessions and add them to their speakers' SpeakerSessions."""
+        byspeaker = {}
+        for session in sessions:
+            byspeaker.setdefault(session.speaker, []).append(session.name)
+        keys = [ndb.Key(SpeakerSessions, speaker, parent=c_key) for speaker in byspeaker]
+        indexes = ndb.get_multi(keys)
+        for i, key in enumerate(keys):
+            if indexes[i] is None:
+                indexes[i] = SpeakerSessions(key=key)
+            indexes[i].sessionNames.extend(byspeaker[key.id()])
+        ndb.put_multi(list(sessions) + indexes)
+        ndb.get_context().call_on_commit(
+            lambda: ConferenceApi._indexSessions(sessions))
+        ndb.get_context().call_on_commit(
+            lambda: ConferenceApi._invalidateAgenda(c_key.urlsafe()))
+
+    @staticmethod
+    @ndb.transactional()
+    def _deleteSessionObject(s_key):
+        """Delete a session and drop it from its speaker's SpeakerSessions."""
+        session = s_key.get()
+        if not session:
+            return False
+        index = ndb.Key(SpeakerSessions, session.speaker, parent=s_key.parent()).get()
+        if index and session.name in index.sessionNames:
+            index.sessionNames.remove(session.name)
+            if index.sessionNames:
+                index.put()
+            else:
+                index.key.delete()
+        s_key.delete()
+        taskqueue.add(params={'remove': s_key.urlsafe()},
+            url='/tasks/update_speakers', transactional=True)
+        ndb.get_context().call_on_commit(lambda: ConferenceApi._unindexDocuments(
+            SESSION_SEARCH_INDEX, [s_key.urlsafe()]))
+        ndb.get_context().call_on_commit(
+            lambda: ConferenceApi._invalidateAgenda(s_key.parent().urlsafe()))
+        return True
    
     def _copySessionToForm(self, session):
         """allocate data from Session to SessionForm."""
-        #session form identification
-        sf = SessionForm()
-        #for all of the fields in session form 
-        for field in sf.all_fields():
-        	#if session has a field name
-            if hasattr(session, field.name):
-            	#if theirs a date set it
-                if field.name == 'date':
-                    setattr(sf, field.name, str(getattr(session, field.name)))
-                #if theirs a time set it
-                elif field.name == 'startTime':
-                    setattr(sf, field.name, str(getattr(session, field.name)))
-                #if not time and date set name
-                else:
-                    setattr(sf, field.name, getattr(session, field.name))
-            #no field name
-            elif field.name == "websafeKey":
-            	#set name as websafekey
-                setattr(sf, field.name, session.key.urlsafe())
-        sf.check_initialized()
-        return sf
+        #date and time become strings, websafeKey the urlsafe key
+        return copySessionToForm(session)
     
     @endpoints.method(SESS_POST_REQUEST, SessionForm,
                       path = 'session',
                       http_method = 'POST',
                       name = 'createSession')
+    @instrumented
     def createSession(self, request):
         """Create a new session."""
         #pass request data to _createSessionObject
         return self._createSessionObject(request)
 
+    @endpoints.method(SESSS_POST_REQUEST, SessionForms,
+                      path = 'sessions/create/{websafeConferenceKey}',
+                      http_method = 'POST',
+                      name = 'createSessions')
+    @instrumented
+    def createSessions(self, request):
+        """Create many sessions of a conference at once (agenda import)."""
+        #ownership is checked once for the whole batch
+        conf = self._getOwnedConference(request.websafeConferenceKey)
+        if len(request.items) > MAX_SESSIONS_PER_REQUEST:
+            raise endpoints.BadRequestException(
+                "At most %d sessions can be created per request" % MAX_SESSIONS_PER_REQUEST)
+        #validate every session before writing any of them
+        for form in request.items:
+            if not form.name:
+                raise endpoints.BadRequestException("The session field 'name' is required")
+        if not request.items:
+            return SessionForms()
+        sessions = self._createSessions(conf.key, request.items)
+        return SessionForms(
+            items=[self._copySessionToForm(session) for session in sessions]
+        )
+
+    @endpoints.method(SESSION_GET_REQUEST, BooleanMessage,
+            path='session/{sessionKey}',
+            http_method='DELETE', name='deleteSession')
+    @instrumented
+    def deleteSession(self, request):
+        """Delete a session (by sessionKey); conference owner only."""
+        user = endpoints.get_current_user()
+        if not user:
+            raise endpoints.UnauthorizedException('User Authorization required')
+        user_id = getUserId(user)
+        s_key = self._sessionKey(request.sessionKey)
+        conf = s_key.parent().get()
+        if not conf:
+            raise endpoints.NotFoundException(
+                "A conference could not be found for session: %s" % request.sessionKey)
+        if user_id != conf.organizerUserId:
+            raise endpoints.ForbiddenException(
+                "The maker of the conference is the only one that can update it.")
+        return BooleanMessage(data=self._deleteSessionObject(s_key))
+
+    @staticmethod
+    def _sessionKey(websafeSessionKey):
+        """Decode a websafe Session key, rejecting anything else."""
+        try:
+            s_key = ndb.Key(urlsafe=websafeSessionKey) if websafeSessionKey else None
+        except (ProtocolBufferDecodeError, TypeError):
+            s_key = None
+        if not s_key or s_key.kind() != 'Session':
+            raise endpoints.BadRequestException(
+                "Invalid session key: %s" % websafeSessionKey)
+        return s_key
+
+    @staticmethod
+    def _conferenceKey(websafeConferenceKey):
+        """Decode a websafe Conference key, rejecting anything else."""
+        try:
+            c_key = ndb.Key(urlsafe=websafeConferenceKey) if websafeConferenceKey else None
+        except (ProtocolBufferDecodeError, TypeError):
+            c_key = None
+        if not c_key or c_key.kind() != 'Conference':
+            raise endpoints.BadRequestException(
+                "Invalid conference key: %s" % websafeConferenceKey)
+        return c_key
+
+    @staticmethod
+    def _invalidateAgenda(websafeConferenceKey):
+        """Move a conference to a new agenda version after session writes;
+        the old snapshot is never read again and expires."""
+        nextGeneration(MEMCACHE_AGENDA_VERSION_PREFIX + websafeConferenceKey)
+
+    @staticmethod
+    def _getAgenda(websafeConferenceKey):
+        """Return the SessionForms of all sessions of a conference.
+
+        They are read from a zlib compressed snapshot in memcache, stored
+        for the conference's agenda version; on a miss the conference's
+        sessions are queried and the snapshot rebuilt.
+        """
+        c_key = ConferenceApi._conferenceKey(websafeConferenceKey)
+        # the version is read before the query: a session write committing
+        # after this moves to a new version, so a snapshot missing it is
+        # never served
+        snapshot_key = MEMCACHE_AGENDA_PREFIX + websafeConferenceKey
+        version, snapshot = getGenerationCached(
+            MEMCACHE_AGENDA_VERSION_PREFIX + websafeConferenceKey, snapshot_key)
+        if snapshot is not None:
+            return protojson.decode_message(SessionForms,
+                zlib.decompress(snapshot)).items
+
+        conf = c_key.get_async()
+        sessions = Session.query(ancestor=c_key).fetch_async()
+        if not conf.get_result():
+            raise endpoints.NotFoundException(
+                'No conference found with key: %s' % websafeConferenceKey)
+        agenda = SessionForms(
+            items=[copySessionToForm(session) for session in sessions.get_result()])
+        setGenerationCached(snapshot_key, version,
+            zlib.compress(protojson.encode_message(agenda)), AGENDA_CACHE_TTL)
+        return agenda.items
+
     @endpoints.method(SESS_GET_REQUEST, SessionForms,
             path='sessions/get/{websafeConferenceKey}',
             http_method='GET', name='getConferenceSessions')
+    @instrumented
     def getConferenceSessions(self, request):
         """get the sessions in a conference."""
-        #the conference via the websafeconferenceKey
-        conf = ndb.Key(urlsafe=request.websafeConferenceKey).get().key
-        #the session contained withing the conference 
-        sessions = Session.query(ancestor=conf)
-        #return the fields contained within session 
+        #the sessions from the conference's agenda snapshot
         return SessionForms(
-            items=[self._copySessionToForm(session) for session in sessions]
+            items=self._getAgenda(request.websafeConferenceKey)
         )
 
     @endpoints.method(SessionsByTypeForm, SessionForms,
             path='session/type/{websafeConferenceKey}',
             http_method='GET',
             name='getConferenceSessionsByType')
+    @instrumented
     def getConferenceSessionsByType(self, request):
         """Get conference sessions by the type of session"""
-
-        #the conference via the websafeconferenceKey
-        conf = ndb.Key(urlsafe=request.websafeConferenceKey).get().key
-        #the session contained withing the conference 
-        sessionAll = Session.query(ancestor=conf)
-        #get all of the sessions with the specified type 
-        sessions = sessionAll.filter(Session.typeOfSession == request.typeOfSession)
+        #get all of the sessions with the specified type
         return SessionForms(
-            items=[self._copySessionToForm(session) for session in sessions]
+            items=[session for session in self._getAgenda(request.websafeConferenceKey)
+                if session.typeOfSession == request.typeOfSession]
         )
 
     @endpoints.method(SessionsBySpeakerForm, SessionForms,
             path='speaker',
             http_method='GET',
             name='getConferenceSessionsBySpeaker')
+    @instrumented
     def getConferenceSessionsBySpeaker(self, request):
         """Get the conference sessions by the name of speaker."""
-        #get all of the sessions with a given speaker 
-        sessions = Session.query(Session.speaker == request.speaker)
+        #the speaker's sessions from the speaker directory
         return SessionForms(
-            items=[self._copySessionToForm(session) for session in sessions]
+            items=[self._copySessionToForm(session)
+                for session in self._getSpeakerSessions(request.speaker)]
         )
 
 
@@ -748,36 +2458,160 @@ class ConferenceApi(remote.Service):
             path='session/name/{websafeConferenceKey}',
             http_method='GET',
             name='getConferenceSessionsByName')
+    @instrumented
     def getConferenceSessionsByName(self, request):
         """Get conference sessions by the name of session """
-        #the conference via the websafeconferenceKey
-        conf = ndb.Key(urlsafe=request.websafeConferenceKey).get().key
-        #the session contained withing the conference 
-        sessions = Session.query(ancestor=conf)
-        #get all of the sessions with the specified name 
-        sessions = sessions.filter(Session.name == request.name)
+        #get all of the sessions with the specified name
         return SessionForms(
-            items=[self._copySessionToForm(session) for session in sessions]
+            items=[session for session in self._getAgenda(request.websafeConferenceKey)
+                if session.name == request.name]
         )
 
     @endpoints.method(SessionsByDateForm, SessionForms,
             path='session/date/{websafeConferenceKey}',
             http_method='GET',
             name='getConferenceSessionsByDate')
+    @instrumented
     def getConferenceSessionsByDate(self, request):
-        """Get conference sessions by the date of the session ."""
-        #if request.date: 
-        #requestDate = datetime.strptime(request.date, "%Y-%m-%d")
-        #the conference via the websafeconferenceKey
-        conf = ndb.Key(urlsafe=request.websafeConferenceKey).get().key
-        #the session contained withing the conference 
-        sessions = Session.query(ancestor=conf)
-        #get all of the sessions with the given duraction
-        sessions = sessions.filter(Session.date == request.date)
+        """Get conference sessions by the date of the session, given as
+        an integer YYYYMMDD."""
+        try:
+            date = str(datetime.strptime(str(request.date), "%Y%m%d").date())
+        except ValueError:
+            raise endpoints.BadRequestException(
+                "'date' must be a date written as YYYYMMDD.")
+        #get all of the sessions on the given date
         return SessionForms(
-            items=[self._copySessionToForm(session) for session in sessions]
+            items=[session for session in self._getAgenda(request.websafeConferenceKey)
+                if session.date == date]
         )
-       
+
+
+    @staticmethod
+    def _parseSessionQuery(request):
+        """Turn a SessionQueryForm into a list of (plan, datastore filter,
+        predicate), in the order the planner prefers to push them down."""
+        def parse(value, fmt, field):
+            try:
+                return datetime.strptime(value, fmt) if value else None
+            except ValueError:
+                raise endpoints.BadRequestException(
+                    "'%s' must be written as %s." % (field, fmt))
+        startDate = parse(request.startDate, "%Y-%m-%d", 'startDate')
+        endDate = parse(request.endDate, "%Y-%m-%d", 'endDate')
+        startTimeFrom = parse(request.startTimeFrom, "%H:%M", 'startTimeFrom')
+        startTimeBefore = parse(request.startTimeBefore, "%H:%M", 'startTimeBefore')
+        include = set(request.includeTypes)
+        exclude = set(request.excludeTypes)
+
+        filters = []
+        # equalities first: a speaker or single type selects few sessions
+        if request.speaker:
+            filters.append(('speaker', Session.speaker == request.speaker,
+                lambda s: s.speaker == request.speaker))
+        if include:
+            filters.append(('typeOfSession',
+                Session.typeOfSession == list(include)[0] if len(include) == 1 else None,
+                lambda s: s.typeOfSession in include))
+        if exclude:
+            filters.append(('excludeTypes', None,
+                lambda s: s.typeOfSession not in exclude))
+        # then one range; datastore allows an inequality on one property only
+        if startDate or endDate:
+            firstDay = startDate.date() if startDate else None
+            lastDay = endDate.date() if endDate else None
+            conditions = []
+            if firstDay:
+                conditions.append(Session.date >= firstDay)
+            if lastDay:
+                conditions.append(Session.date <= lastDay)
+            filters.append(('date', ndb.AND(*conditions),
+                lambda s: s.date is not None and
+                    (not firstDay or s.date >= firstDay) and
+                    (not lastDay or s.date <= lastDay)))
+        if startTimeFrom or startTimeBefore:
+            earliest = startTimeFrom.time() if startTimeFrom else None
+            before = startTimeBefore.time() if startTimeBefore else None
+            conditions = []
+            if earliest:
+                conditions.append(Session.startTime >= earliest)
+            if before:
+                conditions.append(Session.startTime < before)
+            filters.append(('startTime', ndb.AND(*conditions),
+                lambda s: s.startTime is not None and
+                    (not earliest or s.startTime >= earliest) and
+                    (not before or s.startTime < before)))
+        return filters
+
+    @staticmethod
+    def _planSessionQuery(request):
+        """Pick the filter to push down to the datastore and return the
+        query, the plan name and the predicates to apply in memory.
+
+        Exactly one filter is pushed down, so every plan is served by a
+        built-in index or one of the ancestor indexes in index.yaml;
+        predicates are checked for every result, pushed one included,
+        which is cheap and also drops sessions with no date/startTime.
+        """
+        filters = ConferenceApi._parseSessionQuery(request)
+        if request.websafeConferenceKey:
+            query = Session.query(ancestor=ConferenceApi._conferenceKey(
+                request.websafeConferenceKey))
+        else:
+            query = Session.query()
+
+        plan = 'scan'
+        for name, condition, predicate in filters:
+            if condition is not None:
+                plan = name
+                query = query.filter(condition)
+                break
+        return query, plan, [predicate for _, _, predicate in filters]
+
+    @endpoints.method(SessionQueryForm, SessionForms,
+            path='sessions/query',
+            http_method='POST',
+            name='querySessions')
+    @instrumented
+    def querySessions(self, request):
+        """Query sessions by speaker, included/excluded types, date range
+        and start time range, optionally within one conference.
+
+        Dates are YYYY-MM-DD, times HH:MM; startTimeBefore is exclusive.
+        A page holds at most pageSize sessions and is cut short after
+        MAX_SESSION_SCAN candidates, so check nextPageToken rather than the
+        number of items.
+        """
+        page_size = min(request.pageSize or MAX_PAGE_SIZE, MAX_PAGE_SIZE)
+        if page_size <= 0:
+            raise endpoints.BadRequestException("'pageSize' must be positive.")
+        try:
+            cursor = Cursor(urlsafe=request.pageToken) if request.pageToken else None
+        except datastore_errors.BadValueError:
+            raise endpoints.BadRequestException("Invalid 'pageToken'.")
+
+        query, plan, predicates = self._planSessionQuery(request)
+        logging.debug('querySessions plan: %s', plan)
+
+        items = []
+        scanned = 0
+        next_page_token = None
+        it = query.iter(produce_cursors=True, start_cursor=cursor,
+            batch_size=MAX_PAGE_SIZE)
+        try:
+            for session in it:
+                scanned += 1
+                if all(predicate(session) for predicate in predicates):
+                    items.append(self._copySessionToForm(session))
+                if len(items) >= page_size or scanned >= MAX_SESSION_SCAN:
+                    break
+            if it.probably_has_next():
+                next_page_token = it.cursor_after().urlsafe()
+        except (datastore_errors.BadArgumentError, datastore_errors.BadRequestError):
+            raise endpoints.BadRequestException(
+                "'pageToken' does not match the submitted filters.")
+        return SessionForms(items=items, nextPageToken=next_page_token)
+
 
 # - - - Wishlists - - - - - - - - - - - - - - - - -
 #referenced udacity forms during conception
@@ -785,83 +2619,120 @@ class ConferenceApi(remote.Service):
                       path="profile/addSessionToWishlist",
                       http_method="POST",
                       name="addSessionToWishlist")
+    @instrumented
     def addSessionToWishlist(self, request):
         """Add existing session to current users wishlist """
-        #get current user 
-        currentUser = endpoints.get_current_user()
-        #if user is not logged in 
-        if not currentUser:
-            raise endpoints.UnauthorizedException('User authorization is required')
-        #get current users profile 
-        profile = self._getProfileFromUser()
-        #websafekey of the given session 
-        websafe_key = request.websafeSessionKey
-        #could fail due to key not existing, or inability to decode
-        try:
-        	#strip key 
-            #websafe_key = ndb.Key(urlsafe=websafe_key)
-            #if the key is not already in the users session wishlist - add it 
-            if websafe_key not in profile.websafeSessionKey:
-            	profile.websafeSessionKey.append(websafe_key)
-            	profile.put()
-                return self._doProfile(request)
-            #session already in wishlist
-            else:
-                return 'This session is already in your wishlist'
-        except ProtocolBufferDecodeError:
-            websafe_key = None
+        #current user and their profile, loaded once for the whole request
+        ctx = ProfileContext()
+        profile = ctx.profile
+        #key of the given session 
+        s_key = self._sessionKey(request.websafeSessionKey)
+        #session already in wishlist
+        if s_key in profile.wishlistSessionKeys:
+            raise ConflictException('This session is already in your wishlist')
+        if len(profile.wishlistSessionKeys) >= MAX_WISHLIST_SIZE:
+            raise ConflictException(
+                'Your wishlist is full (%d sessions)' % MAX_WISHLIST_SIZE)
+        #the session has to exist
+        if not s_key.get():
+            raise endpoints.NotFoundException(
+                'No session found with key: %s' % request.websafeSessionKey)
+        profile.wishlistSessionKeys.append(s_key)
+        ctx.touch()
+        return self._doProfile(ctx=ctx)
 
 
     @endpoints.method(WishlistForm, SessionForms,
                       path="profile/wishlist'",
                       name="getSessionsInWishlist")
+    @instrumented
     def getSessionsInWishlist(self, request):
-        """Get the sessions a user has saved to their wishlist""" 
-        #get current user       
-        currentUser = endpoints.get_current_user()
-        #if current user is not logged in 
-        if not currentUser:
-            raise endpoints.UnauthorizedException('User authorization is required')
+        """Get the sessions a user has saved to their wishlist, one page at a time if pageSize is given""" 
         #profile of the currently logged in user 
-        profile = self._getProfileFromUser()
-        #key of the sessions in your wishlist 
-        wishlistKeys = [ndb.Key(urlsafe=sessionKey) for sessionKey in profile.websafeSessionKey]
-        #sessions given the wishlist keys 
-        sessions = ndb.get_multi(wishlistKeys)
-        return SessionForms(
-            items=[self._copySessionToForm(session) for session in sessions]
-        )
+        ctx = ProfileContext()
+        profile = ctx.profile
+        #page of the wishlist to return; the token is the offset of the page
+        try:
+            offset = int(request.pageToken or 0)
+        except ValueError:
+            raise endpoints.BadRequestException("Invalid 'pageToken'.")
+        if offset < 0:
+            raise endpoints.BadRequestException("Invalid 'pageToken'.")
+        end = len(profile.wishlistSessionKeys)
+        if request.pageSize is not None:
+            if request.pageSize <= 0:
+                raise endpoints.BadRequestException("'pageSize' must be positive.")
+            end = offset + min(request.pageSize, MAX_PAGE_SIZE)
+        wishlistKeys = profile.wishlistSessionKeys[offset:end]
+        #sessions and the conferences they belong to, in one batch
+        confKeys = list(set(s_key.parent() for s_key in wishlistKeys))
+        entities = ndb.get_multi(wishlistKeys + confKeys)
+        sessions = entities[:len(wishlistKeys)]
+        confs = dict(zip(confKeys, entities[len(wishlistKeys):]))
+
+        #drop sessions that have been deleted since they were added
+        missing = set(s_key for s_key, session in zip(wishlistKeys, sessions) if not session)
+        if missing:
+            profile.wishlistSessionKeys = [s_key for s_key in profile.wishlistSessionKeys
+                if s_key not in missing]
+            end -= len(missing)
+            ctx.touch()
+        ctx.flush()
+
+        forms = []
+        for session in sessions:
+            if session:
+                sf = self._copySessionToForm(session)
+                conf = confs[session.key.parent()]
+                sf.websafeConferenceKey = session.key.parent().urlsafe()
+                sf.conferenceName = conf.name if conf else None
+                forms.append(sf)
+        nextPageToken = None
+        if end < len(profile.wishlistSessionKeys):
+            nextPageToken = str(end)
+        return SessionForms(items=forms, nextPageToken=nextPageToken)
 
     @endpoints.method(WishlistForm, ProfileForm,
     			path='profile/deleteSessionInWishlist',
            		http_method='POST',
             	name='deleteSessionInWishlist')
+    @instrumented
     def deleteSessionInWishlist(self, request):
         """remove a session from a users wishlist."""
+        #current user and their profile, loaded once for the whole request
+        ctx = ProfileContext()
+        profile = ctx.profile
+        #key of the given session 
+        s_key = self._sessionKey(request.websafeSessionKey)
+        #session not in wishlist
+        if s_key not in profile.wishlistSessionKeys:
+            raise endpoints.NotFoundException('This session is not in your wishlist')
+        profile.wishlistSessionKeys.remove(s_key)
+        ctx.touch()
+        return self._doProfile(ctx=ctx)
 
 
-        currentUser = endpoints.get_current_user()
-        #if user is not logged in 
-        if not currentUser:
-            raise endpoints.UnauthorizedException('User authorization is required')
-        #get current users profile 
-        profile = self._getProfileFromUser()
-        #websafekey of the given session 
-        websafe_key = request.websafeSessionKey
-        #could fail due to key not existing, or inability to decode
-        try:
-            #strip key 
-            #websafe_key = ndb.Key(urlsafe=websafe_key)
-            #if the key is not already in the users session wishlist - add it 
-            if websafe_key in profile.websafeSessionKey:
-                profile.websafeSessionKey.remove(websafe_key)
-                profile.put()
-                return self._doProfile(request)
-            #session already in wishlist
-            else:
-                return 'This session is not in your wishlist'
-        except ProtocolBufferDecodeError:
-            websafe_key = None
+    @staticmethod
+    @ndb.transactional()
+    def _migrateProfileWishlist(p_key):
+        """Convert one Profile's legacy wishlist to Session keys."""
+        prof = p_key.get()
+        if prof and migrateWishlist(prof):
+            prof.put()
+
+
+    @staticmethod
+    def _migrateWishlists(websafeCursor=None):
+        """Convert one batch of legacy wishlists; used by the migration
+        task. Returns the websafe cursor of the next batch."""
+        cursor = Cursor(urlsafe=websafeCursor) if websafeCursor else None
+        p_keys, next_cursor, more = Profile.query(Profile.websafeSessionKey > '').fetch_page(
+            WISHLIST_MIGRATION_BATCH_SIZE, start_cursor=cursor, keys_only=True)
+        for p_key in set(p_keys):
+            ConferenceApi._migrateProfileWishlist(p_key)
+        if more and next_cursor:
+            return next_cursor.urlsafe()
+        return None
 
 
 
@@ -886,18 +2757,149 @@ class ConferenceApi(remote.Service):
 		# #	websafe_key = None
 
 
+# - - - Speakers - - - - - - - - - - - - - - - - - - - - - -
+
+    @staticmethod
+    def _speakerId(name):
+        """Return the Speaker id of a speaker name: lowercase words joined
+        by single spaces, so case, spacing & punctuation variants of a name
+        share one Speaker. None for the "To Be Announced" placeholder."""
+        speaker_id = ' '.join(re.findall(r'\w+', (name or '').lower(), re.UNICODE))
+        if speaker_id == SESSION_DEFAULTS['speaker'].lower():
+            return None
+        return speaker_id or None
+
+    @staticmethod
+    @ndb.transactional()
+    def _storeSpeakerSessions(speaker_id, name, s_keys):
+        """Add session keys to a Speaker, creating it if needed; keys it
+        already holds are skipped, so replaying a task is harmless."""
+        speaker = Speaker.get_by_id(speaker_id) or Speaker(id=speaker_id, name=name)
+        known = set(speaker.sessionKeys)
+        added = [s_key for s_key in s_keys if s_key not in known]
+        if added:
+            speaker.sessionKeys.extend(added)
+            speaker.put()
+
+    @staticmethod
+    @ndb.transactional()
+    def _dropSpeakerSession(sp_key, s_key):
+        """Remove a session key from a Speaker, deleting it once empty."""
+        speaker = sp_key.get()
+        if not speaker or s_key not in speaker.sessionKeys:
+            return
+        speaker.sessionKeys.remove(s_key)
+        if speaker.sessionKeys:
+            speaker.put()
+        else:
+            sp_key.delete()
+
+    @staticmethod
+    def _addSpeakerSessions(sessions):
+        """Add sessions to their speakers' Speaker entities."""
+        byspeaker = {}
+        for session in sessions:
+            speaker_id = ConferenceApi._speakerId(session.speaker)
+            if speaker_id:
+                byspeaker.setdefault(speaker_id, (session.speaker, []))[1].append(session.key)
+        for speaker_id, (name, s_keys) in byspeaker.items():
+            ConferenceApi._storeSpeakerSessions(speaker_id, name, s_keys)
+
+    @staticmethod
+    def _updateSpeakers(added, removed):
+        """Bring the speaker directory up to date with created (added) and
+        deleted (removed) sessions, given as websafe keys; used by the
+        update speakers task."""
+        s_keys = [ndb.Key(urlsafe=websafe_key) for websafe_key in added]
+        # a session deleted before this task ran is simply skipped
+        ConferenceApi._addSpeakerSessions(
+            [session for session in ndb.get_multi(s_keys) if session])
+        r_keys = [ndb.Key(urlsafe=websafe_key) for websafe_key in removed]
+        # only sessions that are really gone leave the directory
+        for s_key, session in zip(r_keys, ndb.get_multi(r_keys)):
+            if session:
+                continue
+            for sp_key in Speaker.query(Speaker.sessionKeys == s_key).fetch(keys_only=True):
+                ConferenceApi._dropSpeakerSession(sp_key, s_key)
+
+    @staticmethod
+    def _backfillSpeakers(websafeCursor=None):
+        """Add one batch of existing sessions to the speaker directory;
+        returns the websafe cursor of the next batch, or None when done."""
+        cursor = Cursor(urlsafe=websafeCursor) if websafeCursor else None
+        sessions, next_cursor, more = Session.query().fetch_page(
+            SPEAKER_BACKFILL_BATCH_SIZE, start_cursor=cursor)
+        ConferenceApi._addSpeakerSessions(sessions)
+        return next_cursor.urlsafe() if more and next_cursor else None
+
+    @staticmethod
+    def _getSpeakerSessions(name):
+        """Return the existing sessions of a speaker, by any spelling."""
+        speaker_id = ConferenceApi._speakerId(name)
+        speaker = Speaker.get_by_id(speaker_id) if speaker_id else None
+        if not speaker:
+            return []
+        return [session for session in ndb.get_multi(speaker.sessionKeys) if session]
+
+    def _copySpeakerToForm(self, speaker):
+        """Copy a Speaker into a SpeakerForm."""
+        return SpeakerForm(
+            name=speaker.name,
+            speakerId=speaker.key.id(),
+            sessionCount=len(speaker.sessionKeys),
+            websafeSessionKeys=[s_key.urlsafe() for s_key in speaker.sessionKeys],
+        )
+
+    @endpoints.method(SpeakerQueryForm, SpeakerForms,
+            path='speakers',
+            http_method='POST', name='getSpeakers')
+    @instrumented
+    def getSpeakers(self, request):
+        """List speakers ordered by normalized name, a page at a time."""
+        page_size = min(request.pageSize or MAX_PAGE_SIZE, MAX_PAGE_SIZE)
+        if page_size <= 0:
+            raise endpoints.BadRequestException("'pageSize' must be positive.")
+        try:
+            cursor = Cursor(urlsafe=request.pageToken) if request.pageToken else None
+            speakers, next_cursor, more = Speaker.query().fetch_page(
+                page_size, start_cursor=cursor)
+        except (datastore_errors.BadValueError, datastore_errors.BadRequestError):
+            raise endpoints.BadRequestException("Invalid 'pageToken'.")
+        return SpeakerForms(
+            items=[self._copySpeakerToForm(speaker) for speaker in speakers],
+            nextPageToken=next_cursor.urlsafe() if more and next_cursor else None
+        )
+
+    @endpoints.method(SPEAKER_GET_REQUEST, SpeakerForm,
+            path='speakers/{speaker}',
+            http_method='GET', name='getSpeaker')
+    @instrumented
+    def getSpeaker(self, request):
+        """Look up a speaker by name, in any case or spacing."""
+        speaker_id = self._speakerId(request.speaker)
+        speaker = Speaker.get_by_id(speaker_id) if speaker_id else None
+        if not speaker:
+            raise endpoints.NotFoundException(
+                'No speaker found with name: %s' % request.speaker)
+        return self._copySpeakerToForm(speaker)
+
+
 # - - - Featured Speaker - - - - - - - - - - - - - - - - -
 #referenced Announcments and udacity forms during conception
     @staticmethod
-    def _cacheSpeaker(speaker):
-        """replace default featured speaker with anyone who is the speaker at more than one event""" 
-        #get sessions for a given speaker
-       	sessions = Session.query(Session.speaker == speaker).fetch()
-       	#if the number of sessions they speak at is more than one
-        if len(sessions) > 1:
-            featuredSpeaker = (SPEAKER_TPL % speaker) + ' ' + 'Sessions:'
-            for session in sessions:
-                featuredSpeaker += ' ' + session.name
+    def _cacheSpeaker(speakers, websafeConferenceKey):
+        """replace default featured speaker with whichever of the given speakers has the most (and more than one) sessions in the conference""" 
+        #the speakers' sessions in this conference, kept up to date on session writes
+        c_key = ndb.Key(urlsafe=websafeConferenceKey)
+        indexes = ndb.get_multi([ndb.Key(SpeakerSessions, speaker, parent=c_key)
+            for speaker in speakers if speaker != SESSION_DEFAULTS['speaker']])
+        indexes = [index for index in indexes if index]
+        best = max(indexes, key=lambda index: len(index.sessionNames)) if indexes else None
+        #if the number of sessions they speak at is more than one
+        if best and len(best.sessionNames) > 1:
+            featuredSpeaker = (SPEAKER_TPL % best.key.id()) + ' ' + 'Sessions:'
+            for name in best.sessionNames:
+                featuredSpeaker += ' ' + name
             memcache.set(MEMCACHE_SPEAKER_KEY, featuredSpeaker)
         #set featured feature from memcache 
         else:
@@ -907,6 +2909,7 @@ class ConferenceApi(remote.Service):
     @endpoints.method(message_types.VoidMessage, StringMessage,
             path='conference/featSpeaker/get',
             http_method='GET', name='getFeaturedSpeaker')
+    @instrumented
     def getFeaturedSpeaker(self, request):
         """get featured speaker from memcache"""
         return StringMessage(data=memcache.get(MEMCACHE_SPEAKER_KEY) or "")
@@ -0,0 +1,139 @@
+"""
+instrumentation.py -- per-endpoint latency and RPC counters for ConferenceApi
+
+Decorate an endpoint method under @endpoints.method:
+
+    @endpoints.method(...)
+    @instrumented
+    def getConference(self, request):
+
+A sampled call records its wall time and the datastore, memcache and task
+queue RPCs made while it runs (counted by an apiproxy post-call hook) and
+adds them to memcache counters with one offset_multi; getStats() reads them
+back for the admin stats handler.
+
+"""
+
+import functools
+import os
+import random
+import threading
+import time
+
+from google.appengine.api import apiproxy_stub_map
+from google.appengine.api import memcache
+
+# fraction of calls measured; the rest pay only a random() call
+SAMPLE_RATE = float(os.environ.get('INSTRUMENTATION_SAMPLE_RATE', '0.1'))
+MEMCACHE_STATS_PREFIX = 'ENDPOINT_STATS_'
+# upper bounds (ms) of the latency histogram buckets, None is overflow
+LATENCY_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, None)
+BUCKET_COUNTERS = ['latencyLe%s' % (bound or 'Inf') for bound in LATENCY_BUCKETS]
+
+# (service, call) -> counter name
+RPC_COUNTERS = {
+    ('datastore_v3', 'Get'): 'datastoreGets',
+    ('datastore_v3', 'Put'): 'datastorePuts',
+    ('datastore_v3', 'Delete'): 'datastoreDeletes',
+    ('datastore_v3', 'RunQuery'): 'datastoreQueries',
+    ('datastore_v3', 'Next'): 'datastoreQueryBatches',
+    ('datastore_v3', 'Commit'): 'datastoreCommits',
+}
+COUNTERS = sorted(set(RPC_COUNTERS.values()) |
+    set(['calls', 'latencyMs', 'memcacheHits', 'memcacheMisses',
+         'tasksEnqueued']))
+
+endpointNames = []              # every instrumented endpoint, for getStats
+_call = threading.local()       # counters of the sampled call in progress
+
+
+def _countRpc(service, call, request, response):
+    """apiproxy post-call hook adding an RPC to the sampled call's counters."""
+    counters = getattr(_call, 'counters', None)
+    if counters is None:
+        return
+    if service == 'memcache' and call == 'Get':
+        hits = response.item_size()
+        counters['memcacheHits'] += hits
+        counters['memcacheMisses'] += request.key_size() - hits
+    elif service == 'taskqueue' and call == 'BulkAdd':
+        counters['tasksEnqueued'] += request.add_request_size()
+    elif (service, call) in RPC_COUNTERS:
+        counters[RPC_COUNTERS[(service, call)]] += 1
+
+apiproxy_stub_map.apiproxy.GetPostCallHooks().Append(
+    'instrumentation', _countRpc)
+
+
+def _bucket(ms):
+    """Return the counter name of the latency bucket holding ms."""
+    for bound, counter in zip(LATENCY_BUCKETS, BUCKET_COUNTERS):
+        if bound is None or ms <= bound:
+            return counter
+
+
+def _flush(name, counters):
+    """Add a sampled call's counters to the memcache totals of name."""
+    prefix = '%s%s_' % (MEMCACHE_STATS_PREFIX, name)
+    try:
+        memcache.offset_multi(
+            dict((key, value) for key, value in counters.items() if value),
+            key_prefix=prefix, initial_value=0)
+    except Exception:
+        # stats must never fail the request they measure
+        pass
+
+
+def instrumented(method):
+    """Sample SAMPLE_RATE of the calls of an endpoint method into its stats."""
+    name = method.__name__
+    endpointNames.append(name)
+
+    @functools.wraps(method)
+    def wrapper(self, request):
+        # nested endpoint calls are counted in the outer one
+        if random.random() >= SAMPLE_RATE or getattr(_call, 'counters', None) is not None:
+            return method(self, request)
+        _call.counters = counters = dict.fromkeys(COUNTERS, 0)
+        start = time.time()
+        try:
+            return method(self, request)
+        finally:
+            _call.counters = None
+            ms = int((time.time() - start) * 1000)
+            counters['calls'] = 1
+            counters['latencyMs'] = ms
+            counters[_bucket(ms)] = 1
+            _flush(name, counters)
+    return wrapper
+
+
+def _statsKeys():
+    """Return the memcache keys (without prefix) of all endpoint counters."""
+    return ['%s_%s' % (name, counter) for name in endpointNames
+        for counter in COUNTERS + BUCKET_COUNTERS]
+
+
+def getStats():
+    """Return {endpoint: {counter: total}} of the sampled calls, with
+    per-call averages and the latency histogram."""
+    values = memcache.get_multi(_statsKeys(), key_prefix=MEMCACHE_STATS_PREFIX)
+    stats = {}
+    for name in sorted(endpointNames):
+        totals = dict((counter, values.get('%s_%s' % (name, counter), 0))
+            for counter in COUNTERS + BUCKET_COUNTERS)
+        calls = totals['calls']
+        if not calls:
+            continue
+        endpoint = dict((counter, totals[counter]) for counter in COUNTERS)
+        endpoint['averages'] = dict((counter, round(float(endpoint[counter]) / calls, 2))
+            for counter in COUNTERS if counter != 'calls')
+        endpoint['latencyHistogram'] = [[bound, totals[bucket]]
+            for bound, bucket in zip(LATENCY_BUCKETS, BUCKET_COUNTERS)]
+        stats[name] = endpoint
+    return {'sampleRate': SAMPLE_RATE, 'endpoints': stats}
+
+
+def resetStats():
+    """Drop the memcache totals of every instrumented endpoint."""
+    memcache.delete_multi(_statsKeys(), key_prefix=MEMCACHE_STATS_PREFIX)
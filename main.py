@@ -12,14 +12,23 @@ created by wesc on 2014 may 24
 
 __author__ = 'wesc+api@google.com (Wesley Chun)'
 
+import json
+import logging
+
 import webapp2
 from google.appengine.api import app_identity
 from google.appengine.api import mail
+from google.appengine.api import taskqueue
 from conference import ConferenceApi
+import instrumentation
+
+# push task payloads are limited to 100KB
+IMPORT_TASK_BYTES = 90000
 
 class SetAnnouncementHandler(webapp2.RequestHandler):
     def get(self):
-        """Set Announcement in Memcache."""
+        """Reconcile nearly sold out conferences & set Announcement in Memcache."""
+        ConferenceApi._reconcileNearlySoldOut()
         ConferenceApi._cacheAnnouncement()
         self.response.set_status(204)
 
@@ -40,12 +49,165 @@ class SendConfirmationEmailHandler(webapp2.RequestHandler):
 class SetFeaturedSpeakerHandler(webapp2.RequestHandler):
     def post(self):
         """Set the current featured speaker."""
-        ConferenceApi._cacheSpeaker(self.request.get('speaker'),
-            self.request.get('conferenceKey'))        
+        ConferenceApi._cacheSpeaker(self.request.get_all('speaker'),
+            self.request.get('websafeConferenceKey'))
+
+class UpdateSpeakersHandler(webapp2.RequestHandler):
+    def post(self):
+        """Add created & drop deleted sessions in the speaker directory."""
+        ConferenceApi._updateSpeakers(self.request.get_all('add'),
+            self.request.get_all('remove'))
+
+class ReconcileSeatsHandler(webapp2.RequestHandler):
+    def post(self):
+        """Fold a conference's seat shards into seatsAvailable."""
+        ConferenceApi._reconcileSeats(self.request.get('websafeConferenceKey'))
+
+class ApplyGroupBookingHandler(webapp2.RequestHandler):
+    def post(self):
+        """Register the attendees of a group booking."""
+        ConferenceApi._applyGroupBooking(
+            self.request.get('websafeConferenceKey'),
+            self.request.get_all('attendee'),
+            self.request.get('bookingId'))
+
+class PromoteWaitlistHandler(webapp2.RequestHandler):
+    def post(self):
+        """Give freed seats to a conference's waitlist, batch by batch."""
+        wsck = self.request.get('websafeConferenceKey')
+        if ConferenceApi._promoteWaitlist(wsck):
+            taskqueue.add(params={'websafeConferenceKey': wsck},
+                url='/tasks/promote_waitlist')
+
+class UpdateOrganizerNameHandler(webapp2.RequestHandler):
+    def post(self):
+        """Copy an organizer's new displayName onto their conferences."""
+        ConferenceApi._updateOrganizerDisplayName(
+            self.request.get('organizerUserId'),
+            self.request.get('websafeCursor') or None)
+
+
+class BatchMigrationHandler(webapp2.RequestHandler):
+    """Run a migration in cursor batches: GET starts it, each POST task
+    runs batch(websafeCursor) and queues the next batch at url."""
+    url = None
+    batch = None
+
+    def get(self):
+        """Start the migration."""
+        taskqueue.add(url=self.url)
+        self.response.set_status(202)
+
+    def post(self):
+        """Run one batch and queue the next one."""
+        next_cursor = self.batch(self.request.get('websafeCursor') or None)
+        if next_cursor:
+            taskqueue.add(params={'websafeCursor': next_cursor}, url=self.url)
+
+class BackfillSpeakersHandler(BatchMigrationHandler):
+    """Build the speaker directory from existing sessions."""
+    url = '/tasks/backfill_speakers'
+    batch = staticmethod(ConferenceApi._backfillSpeakers)
+
+class BackfillOrganizerNamesHandler(BatchMigrationHandler):
+    """Backfill organizerDisplayName on existing conferences."""
+    url = '/tasks/backfill_organizer_names'
+    batch = staticmethod(ConferenceApi._backfillOrganizerDisplayNames)
+
+class MigrateWishlistsHandler(BatchMigrationHandler):
+    """Convert legacy wishlists to Session keys."""
+    url = '/tasks/migrate_wishlists'
+    batch = staticmethod(ConferenceApi._migrateWishlists)
+
+class IndexSearchHandler(BatchMigrationHandler):
+    """(Re)build the conference & session search indexes."""
+    url = '/tasks/index_search'
+    batch = staticmethod(ConferenceApi._indexSearchDocuments)
+
+class BackfillRegistrationsHandler(BatchMigrationHandler):
+    """Create Registrations for existing attendees."""
+    url = '/tasks/backfill_registrations'
+    batch = staticmethod(ConferenceApi._backfillRegistrations)
+
+
+class ImportConferencesHandler(webapp2.RequestHandler):
+    def post(self):
+        """Split uploaded conference JSON lines into import tasks."""
+        tasks = []
+        chunk, size = [], 0
+        for line in self.request.body.splitlines():
+            if not line.strip():
+                continue
+            if chunk and size + len(line) > IMPORT_TASK_BYTES:
+                tasks.append(taskqueue.Task(payload='\n'.join(chunk),
+                    url='/tasks/import_conferences'))
+                chunk, size = [], 0
+            chunk.append(line)
+            size += len(line) + 1
+        if chunk:
+            tasks.append(taskqueue.Task(payload='\n'.join(chunk),
+                url='/tasks/import_conferences'))
+
+        # Queue.add takes at most 100 tasks per call
+        queue = taskqueue.Queue()
+        for i in range(0, len(tasks), 100):
+            queue.add(tasks[i:i + 100])
+        self.response.set_status(202)
+        self.response.write('%d import tasks queued\n' % len(tasks))
+
+
+class ImportConferencesTaskHandler(webapp2.RequestHandler):
+    def post(self):
+        """Import one chunk of conference JSON lines."""
+        created, errors = ConferenceApi._importConferences(
+            self.request.body.splitlines())
+        for error in errors:
+            logging.warning('Conference import skipped %s', error)
+        logging.info('Conference import created %d conferences', created)
+
+
+class ExportConferencesHandler(webapp2.RequestHandler):
+    def get(self):
+        """Write one batch of conferences as JSON lines; the X-Next-Cursor
+        header holds the websafeCursor of the next batch."""
+        lines, next_cursor = ConferenceApi._exportConferences(
+            self.request.get('websafeCursor') or None)
+        self.response.headers['Content-Type'] = 'application/x-ndjson'
+        if next_cursor:
+            self.response.headers['X-Next-Cursor'] = next_cursor
+        for line in lines:
+            self.response.write(line + '\n')
+
+
+class EndpointStatsHandler(webapp2.RequestHandler):
+    def get(self):
+        """Write the sampled per-endpoint latency and RPC stats as JSON."""
+        self.response.headers['Content-Type'] = 'application/json'
+        self.response.write(json.dumps(instrumentation.getStats(),
+            indent=2, sort_keys=True))
+
+    def post(self):
+        """Reset the per-endpoint stats."""
+        instrumentation.resetStats()
+        self.response.set_status(204)
 
 
 app = webapp2.WSGIApplication([
     ('/crons/set_announcement', SetAnnouncementHandler),
     ('/tasks/send_confirmation_email', SendConfirmationEmailHandler),
     ('/tasks/set_featured_speaker', SetFeaturedSpeakerHandler),
+    ('/tasks/update_speakers', UpdateSpeakersHandler),
+    ('/tasks/backfill_speakers', BackfillSpeakersHandler),
+    ('/tasks/reconcile_seats', ReconcileSeatsHandler),
+    ('/tasks/promote_waitlist', PromoteWaitlistHandler),
+    ('/tasks/apply_group_booking', ApplyGroupBookingHandler),
+    ('/tasks/update_organizer_name', UpdateOrganizerNameHandler),
+    ('/tasks/backfill_organizer_names', BackfillOrganizerNamesHandler),
+    ('/tasks/import_conferences', ImportConferencesTaskHandler),
+    ('/tasks/migrate_wishlists', MigrateWishlistsHandler),
+    ('/tasks/index_search', IndexSearchHandler),
+    ('/tasks/backfill_registrations', BackfillRegistrationsHandler),
+    ('/admin/import_conferences', ImportConferencesHandler),
+    ('/admin/export_conferences', ExportConferencesHandler),
+    ('/admin/endpoint_stats', EndpointStatsHandler),
 ], debug=True)
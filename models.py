@@ -29,7 +29,35 @@ class Profile(ndb.Model):
     mainEmail = ndb.StringProperty()
     teeShirtSize = ndb.StringProperty(default='NOT_SPECIFIED')
     conferenceKeysToAttend = ndb.StringProperty(repeated=True)
-    websafeSessionKey = ndb.StringProperty(repeated=True)
+    websafeSessionKey = ndb.StringProperty(repeated=True) # legacy wishlist
+    wishlistSessionKeys = ndb.KeyProperty(kind='Session', repeated=True, indexed=False)
+
+
+class Registration(ndb.Model):
+    """Registration -- a Profile's seat at a Conference; child of the
+    Profile, id is the websafe Conference key"""
+    conference   = ndb.KeyProperty(kind='Conference')
+    registeredAt = ndb.DateTimeProperty(auto_now_add=True)
+    bookingId    = ndb.StringProperty(indexed=False) # set by group bookings
+
+
+class WaitlistEntry(ndb.Model):
+    """WaitlistEntry -- a Profile waiting for a seat at a sold out
+    Conference; child of the Profile, id is the websafe Conference key"""
+    conference = ndb.KeyProperty(kind='Conference')
+    joinedAt   = ndb.DateTimeProperty(auto_now_add=True)
+
+
+class WaitlistCount(ndb.Model):
+    """WaitlistCount -- number of WaitlistEntries of a Conference; id is
+    the websafe Conference key"""
+    count = ndb.IntegerProperty(default=0, indexed=False)
+
+
+class GroupBooking(ndb.Model):
+    """GroupBooking -- attendees of a group booking whose reserved seat was
+    given back; id is the bookingId"""
+    released = ndb.StringProperty(repeated=True, indexed=False)
 
 
 class ProfileMiniForm(messages.Message):
@@ -57,6 +85,12 @@ class BooleanMessage(messages.Message):
     data = messages.BooleanField(1)
 
 
+class CacheStatsForm(messages.Message):
+    """CacheStatsForm-- outbound cache hit/miss counters message"""
+    hits = messages.IntegerField(1)
+    misses = messages.IntegerField(2)
+
+
 class Conference(ndb.Model):
     """Conference -- Conference object"""
     name            = ndb.StringProperty(required=True)
@@ -69,6 +103,21 @@ class Conference(ndb.Model):
     endDate         = ndb.DateProperty()
     maxAttendees    = ndb.IntegerProperty()
     seatsAvailable  = ndb.IntegerProperty()
+    seatShardBase   = ndb.IntegerProperty(indexed=False)
+    organizerDisplayName = ndb.StringProperty(indexed=False)
+    updated         = ndb.DateTimeProperty(auto_now=True)
+
+
+class AnnouncementIndex(ndb.Model):
+    """AnnouncementIndex -- nearly sold out conferences, websafe key -> name"""
+    conferences = ndb.JsonProperty()
+
+
+class SeatShard(ndb.Model):
+    """SeatShard -- slice of a Conference's seats, reserved independently"""
+    conference = ndb.KeyProperty(kind='Conference', indexed=False)
+    capacity   = ndb.IntegerProperty(indexed=False)
+    reserved   = ndb.IntegerProperty(default=0, indexed=False)
 
 
 class ConferenceForm(messages.Message):
@@ -90,6 +139,24 @@ class ConferenceForm(messages.Message):
 class ConferenceForms(messages.Message):
     """ConferenceForms -- multiple Conference outbound form message"""
     items = messages.MessageField(ConferenceForm, 1, repeated=True)
+    nextPageToken = messages.StringField(2)
+
+
+class ConferenceSummaryForm(messages.Message):
+    """ConferenceSummaryForm -- Conference list view outbound form message"""
+    name            = messages.StringField(1)
+    city            = messages.StringField(2)
+    startDate       = messages.StringField(3)
+    endDate         = messages.StringField(4)
+    maxAttendees    = messages.IntegerField(5)
+    seatsAvailable  = messages.IntegerField(6)
+    websafeKey      = messages.StringField(7)
+
+
+class ConferenceSummaryForms(messages.Message):
+    """ConferenceSummaryForms -- multiple ConferenceSummaryForm outbound form message"""
+    items = messages.MessageField(ConferenceSummaryForm, 1, repeated=True)
+    nextPageToken = messages.StringField(2)
 
 
 class TeeShirtSize(messages.Enum):
@@ -121,6 +188,8 @@ class ConferenceQueryForm(messages.Message):
 class ConferenceQueryForms(messages.Message):
     """ConferenceQueryForms -- multiple ConferenceQueryForm inbound form message"""
     filters = messages.MessageField(ConferenceQueryForm, 1, repeated=True)
+    pageSize = messages.IntegerField(2)
+    pageToken = messages.StringField(3)
 
 
 class Session(ndb.Model):
@@ -134,6 +203,18 @@ class Session(ndb.Model):
     startTime = ndb.TimeProperty()
 
 
+class SpeakerSessions(ndb.Model):
+    """SpeakerSessions -- a speaker's sessions within one Conference"""
+    sessionNames = ndb.StringProperty(repeated=True, indexed=False)
+
+
+class Speaker(ndb.Model):
+    """Speaker -- a speaker's sessions across conferences, keyed by the
+    normalized speaker name"""
+    name = ndb.StringProperty(indexed=False)
+    sessionKeys = ndb.KeyProperty(kind='Session', repeated=True)
+
+
 class SessionForm(messages.Message):
     """Session -- Session outbound form messge"""
     name = messages.StringField(1)
@@ -151,6 +232,7 @@ class SessionForm(messages.Message):
 class SessionForms(messages.Message):
     """ConferenceForms -- outbound form message"""
     items = messages.MessageField(SessionForm, 1, repeated=True)
+    nextPageToken = messages.StringField(2)
 
 
 class SessionsByTypeForm(messages.Message):
@@ -176,7 +258,88 @@ class SessionsBySpeakerForm(messages.Message):
     speaker = messages.StringField(1)
 
 
+class SessionQueryForm(messages.Message):
+    """SessionQueryForm -- multi-criteria session query inbound form message"""
+    websafeConferenceKey = messages.StringField(1)
+    speaker = messages.StringField(2)
+    includeTypes = messages.StringField(3, repeated=True)
+    excludeTypes = messages.StringField(4, repeated=True)
+    startDate = messages.StringField(5)
+    endDate = messages.StringField(6)
+    startTimeFrom = messages.StringField(7)
+    startTimeBefore = messages.StringField(8)
+    pageSize = messages.IntegerField(9)
+    pageToken = messages.StringField(10)
+
+
 class WishlistForm(messages.Message):
     """WishlistForm -- add session to wishlist form"""
     websafeSessionKey = messages.StringField(2)
+    pageSize = messages.IntegerField(3)
+    pageToken = messages.StringField(4)
+
+
+class SearchForm(messages.Message):
+    """SearchForm -- conference/session search inbound form message"""
+    query = messages.StringField(1)
+    websafeConferenceKey = messages.StringField(2)
+    pageSize = messages.IntegerField(3)
+    pageToken = messages.StringField(4)
+
+
+class SpeakerForm(messages.Message):
+    """SpeakerForm -- Speaker outbound form message"""
+    name = messages.StringField(1)
+    speakerId = messages.StringField(2)
+    sessionCount = messages.IntegerField(3)
+    websafeSessionKeys = messages.StringField(4, repeated=True)
+
+
+class SpeakerForms(messages.Message):
+    """SpeakerForms -- multiple Speaker outbound form message"""
+    items = messages.MessageField(SpeakerForm, 1, repeated=True)
+    nextPageToken = messages.StringField(2)
+
+
+class SpeakerQueryForm(messages.Message):
+    """SpeakerQueryForm -- speaker listing inbound form message"""
+    pageSize = messages.IntegerField(1)
+    pageToken = messages.StringField(2)
+
+
+class AttendeeForm(messages.Message):
+    """AttendeeForm -- conference roster entry outbound form message"""
+    displayName = messages.StringField(1)
+    mainEmail = messages.StringField(2)
+    teeShirtSize = messages.StringField(3)
+    registeredAt = messages.StringField(4)
+
+
+class AttendeeForms(messages.Message):
+    """AttendeeForms -- conference roster page outbound form message"""
+    items = messages.MessageField(AttendeeForm, 1, repeated=True)
+    nextPageToken = messages.StringField(2)
+
+
+class AttendanceForm(messages.Message):
+    """AttendanceForm -- conference attendance counts outbound form message"""
+    attendees = messages.IntegerField(1)
+    maxAttendees = messages.IntegerField(2)
+    seatsAvailable = messages.IntegerField(3)
+
+
+class WaitlistPositionForm(messages.Message):
+    """WaitlistPositionForm -- place in a conference waitlist outbound form message"""
+    waiting = messages.BooleanField(1)
+    position = messages.IntegerField(2)
+
+
+class GroupBookingForm(messages.Message):
+    """GroupBookingForm -- group registration inbound form message"""
+    attendees = messages.StringField(1, repeated=True)
+
 
+class GroupBookingResultForm(messages.Message):
+    """GroupBookingResultForm -- group registration outbound form message"""
+    booked = messages.StringField(1, repeated=True)
+    alreadyRegistered = messages.StringField(2, repeated=True)
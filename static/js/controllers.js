@@ -346,6 +346,11 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
     $scope.pagination = $scope.pagination || {};
     $scope.pagination.currentPage = 0;
     $scope.pagination.pageSize = 20;
+    /**
+     * Holds the token of the next page of queryConferences results, if any.
+     * @type {string|undefined}
+     */
+    $scope.pagination.nextPageToken = undefined;
     /**
      * Returns the number of the pages in the pagination.
      *
@@ -414,6 +419,7 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
      */
     $scope.queryConferences = function () {
         $scope.submitted = false;
+        $scope.pagination.nextPageToken = undefined;
         if ($scope.selectedTab == 'ALL') {
             $scope.queryConferencesAll();
         } else if ($scope.selectedTab == 'YOU_HAVE_CREATED') {
@@ -424,11 +430,17 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
     };
 
     /**
-     * Invokes the conference.queryConferences API.
+     * Invokes the conference.queryConferenceSummaries API.
+     *
+     * @param pageToken the token of the page to append, or undefined to start a new query.
      */
-    $scope.queryConferencesAll = function () {
+    $scope.queryConferencesAll = function (pageToken) {
         var sendFilters = {
-            filters: []
+            filters: [],
+            pageSize: $scope.pagination.pageSize
+        }
+        if (pageToken) {
+            sendFilters.pageToken = pageToken;
         }
         for (var i = 0; i < $scope.filters.length; i++) {
             var filter = $scope.filters[i];
@@ -441,7 +453,7 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
             }
         }
         $scope.loading = true;
-        gapi.client.conference.queryConferences(sendFilters).
+        gapi.client.conference.queryConferenceSummaries(sendFilters).
             execute(function (resp) {
                 $scope.$apply(function () {
                     $scope.loading = false;
@@ -458,10 +470,17 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
                         $scope.alertStatus = 'success';
                         $log.info($scope.messages);
 
-                        $scope.conferences = [];
+                        if (!pageToken) {
+                            $scope.conferences = [];
+                            $scope.pagination.currentPage = 0;
+                        }
                         angular.forEach(resp.items, function (conference) {
                             $scope.conferences.push(conference);
                         });
+                        $scope.pagination.nextPageToken = resp.nextPageToken;
+                        if (pageToken) {
+                            $scope.pagination.currentPage = $scope.pagination.numberOfPages() - 1;
+                        }
                     }
                     $scope.submitted = true;
                 });
@@ -469,11 +488,20 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
     }
 
     /**
-     * Invokes the conference.getConferencesCreated method.
+     * Fetches the next page of the current queryConferences results.
+     */
+    $scope.queryConferencesMore = function () {
+        if ($scope.pagination.nextPageToken) {
+            $scope.queryConferencesAll($scope.pagination.nextPageToken);
+        }
+    };
+
+    /**
+     * Invokes the conference.getConferenceSummariesCreated method.
      */
     $scope.getConferencesCreated = function () {
         $scope.loading = true;
-        gapi.client.conference.getConferencesCreated().
+        gapi.client.conference.getConferenceSummariesCreated().
             execute(function (resp) {
                 $scope.$apply(function () {
                     $scope.loading = false;
@@ -511,7 +539,7 @@ conferenceApp.controllers.controller('ShowConferenceCtrl', function ($scope, $lo
      */
     $scope.getConferencesAttend = function () {
         $scope.loading = true;
-        gapi.client.conference.getConferencesToAttend().
+        gapi.client.conference.getConferenceSummariesToAttend().
             execute(function (resp) {
                 $scope.$apply(function () {
                     if (resp.error) {
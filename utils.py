@@ -1,11 +1,26 @@
+import hashlib
 import json
+import operator
 import os
+import threading
 import time
 import uuid
 
+from google.appengine.api import memcache
 from google.appengine.api import urlfetch
 from models import Profile
 
+# point at a local stub to test without Google's endpoint
+TOKENINFO_URL = os.environ.get('TOKENINFO_URL',
+                               'https://www.googleapis.com/oauth2/v1/tokeninfo')
+MEMCACHE_USER_ID_PREFIX = 'OAUTH_USER_ID_'
+USER_ID_CACHE_TTL = 3600    # upper bound, tokens usually expire sooner
+USER_ID_CACHE_SIZE = 10000
+
+_userIds = {}                   # token hash -> (user_id, expires at)
+_request = threading.local()    # last identity resolved by this thread
+
+
 def getUserId(user, id_type="email"):
     if id_type == "email":
         return user.email()
@@ -14,25 +29,21 @@ def getUserId(user, id_type="email"):
         """A workaround implementation for getting userid."""
         auth = os.getenv('HTTP_AUTHORIZATION')
         bearer, token = auth.split()
-        token_type = 'id_token'
-        if 'OAUTH_USER_ID' in os.environ:
-            token_type = 'access_token'
-        url = ('https://www.googleapis.com/oauth2/v1/tokeninfo?%s=%s'
-               % (token_type, token))
-        user = {}
-        wait = 1
-        for i in range(3):
-            resp = urlfetch.fetch(url)
-            if resp.status_code == 200:
-                user = json.loads(resp.content)
-                break
-            elif resp.status_code == 400 and 'invalid_token' in resp.content:
-                url = ('https://www.googleapis.com/oauth2/v1/tokeninfo?%s=%s'
-                       % ('access_token', token))
-            else:
-                time.sleep(wait)
-                wait = wait + i
-        return user.get('user_id', '')
+        token_key = hashlib.sha256(token).hexdigest()
+
+        # never resolve the same identity twice within one request
+        request_id = os.environ.get('REQUEST_LOG_ID')
+        memo = getattr(_request, 'memo', None)
+        if request_id and memo and memo[:2] == (request_id, token_key):
+            return memo[2]
+
+        user_id = _getCachedUserId(token_key)
+        if user_id is None:
+            user_id, ttl = _fetchUserId(token)
+            if user_id and ttl > 0:
+                _setCachedUserId(token_key, user_id, ttl)
+        _request.memo = (request_id, token_key, user_id)
+        return user_id
 
     if id_type == "custom":
         # implement your own user_id creation and getting algorythm
@@ -43,3 +54,135 @@ def getUserId(user, id_type="email"):
             return profile.id()
         else:
             return str(uuid.uuid1().get_hex())
+
+
+def _fetchUserId(token):
+    """Resolve a token through tokeninfo; return (user_id, seconds valid)."""
+    token_type = 'id_token'
+    if 'OAUTH_USER_ID' in os.environ:
+        token_type = 'access_token'
+    url = '%s?%s=%s' % (TOKENINFO_URL, token_type, token)
+    user = {}
+    wait = 1
+    for i in range(3):
+        resp = urlfetch.fetch(url)
+        if resp.status_code == 200:
+            user = json.loads(resp.content)
+            break
+        elif resp.status_code == 400 and 'invalid_token' in resp.content:
+            url = '%s?%s=%s' % (TOKENINFO_URL, 'access_token', token)
+        else:
+            time.sleep(wait)
+            wait = wait + i
+    ttl = min(int(user.get('expires_in', 0)), USER_ID_CACHE_TTL)
+    return user.get('user_id', ''), ttl
+
+
+def _getCachedUserId(token_key):
+    """Return the user id cached for a token hash, in-process then memcache."""
+    now = time.time()
+    cached = _userIds.get(token_key)
+    if not cached:
+        cached = memcache.get(MEMCACHE_USER_ID_PREFIX + token_key)
+        if cached:
+            _rememberUserId(token_key, cached)
+    if cached and cached[1] > now:
+        return cached[0]
+    return None
+
+
+def _rememberUserId(token_key, cached):
+    """Store (user_id, expires at) in-process, keeping at most
+    USER_ID_CACHE_SIZE entries."""
+    if len(_userIds) >= USER_ID_CACHE_SIZE:
+        now = time.time()
+        for key, value in _userIds.items():
+            if value[1] <= now:
+                _userIds.pop(key, None)
+        if len(_userIds) >= USER_ID_CACHE_SIZE:
+            _userIds.clear()
+    _userIds[token_key] = cached
+
+
+def _setCachedUserId(token_key, user_id, ttl):
+    """Cache a resolved user id in both tiers until the token expires."""
+    cached = (user_id, time.time() + ttl)
+    _rememberUserId(token_key, cached)
+    memcache.set(MEMCACHE_USER_ID_PREFIX + token_key, cached, time=ttl)
+
+
+def compileFormCopier(form_cls, model_cls, converters=None):
+    """Return a function copying a model_cls entity into a new form_cls.
+
+    The fields to copy are worked out once, here, instead of scanning
+    all_fields() with hasattr for every row: form fields named after a
+    model property are copied as-is, fields in converters are filled by
+    calling converters[name](entity) and all others are left unset.
+    """
+    converters = converters or {}
+    plan = []
+    for field in form_cls.all_fields():
+        if field.name in converters:
+            plan.append((field.name, converters[field.name]))
+        elif field.name in model_cls._properties:
+            plan.append((field.name, operator.attrgetter(field.name)))
+    plan = tuple(plan)
+    required = any(field.required for field in form_cls.all_fields())
+
+    def copy(entity):
+        form = form_cls()
+        for name, getter in plan:
+            value = getter(entity)
+            # unset and None/[] read back the same; skip field validation
+            if value is not None and value != []:
+                setattr(form, name, value)
+        if required:
+            form.check_initialized()
+        return form
+    return copy
+
+
+def stringOrNone(name):
+    """Return a converter giving str() of a (date/time) property, or None."""
+    getter = operator.attrgetter(name)
+    def convert(entity):
+        value = getter(entity)
+        return str(value) if value else None
+    return convert
+
+
+def websafeKey(entity):
+    """Converter giving the entity's urlsafe key."""
+    return entity.key.urlsafe()
+
+
+def getGenerationCached(generation_key, cache_key):
+    """Read a generation counter and the value cached for it in one
+    get_multi. Returns (generation, value); value is None unless it was
+    stored under the current generation. A generation key that was
+    evicted restarts from the current time in ms, so it never comes back
+    to an older generation."""
+    values = memcache.get_multi([generation_key, cache_key])
+    generation = values.get(generation_key)
+    if generation is None:
+        memcache.add(generation_key, int(time.time() * 1000))
+        return memcache.get(generation_key), None
+    cached = values.get(cache_key)
+    if cached is not None and cached[0] == generation:
+        return generation, cached[1]
+    return generation, None
+
+
+def setGenerationCached(cache_key, generation, value, ttl):
+    """Cache value for the generation getGenerationCached returned;
+    values larger than memcache allows are not cached."""
+    try:
+        memcache.set(cache_key, (generation, value), time=ttl)
+    except ValueError:
+        pass
+
+
+def nextGeneration(generation_key):
+    """Move a generation counter on, so values cached for earlier
+    generations are never read again and expire."""
+    memcache.incr(generation_key, initial_value=int(time.time() * 1000))